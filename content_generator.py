@@ -5,8 +5,10 @@ import random
 import logging
 from datetime import datetime
 import requests
-import pandas as pd
 from dotenv import load_dotenv
+from prompt_builder import PromptBuilder, UsageTracker
+from dedup import PostDeduplicator
+from records import Product, BlogPost, split_keywords, read_products_csv, write_posts_json
 
 load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -17,6 +19,8 @@ class BlogContentGenerator:
         if not self.openai_api_key:
             logging.warning("OpenAI API key not found. Will use fallback content generation.")
         self.model = "gpt-3.5-turbo"
+        self.prompt_builder = PromptBuilder()
+        self.usage = UsageTracker.from_env(self.model)
         # Ensure blog_templates attribute is defined
         self.blog_templates = [
             "Discover Why {product_name} is Trending Right Now",
@@ -37,42 +41,140 @@ class BlogContentGenerator:
         )
         return title
     
+    def _chat_completion(self, messages, max_tokens, label, json_output=False):
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.openai_api_key}"
+        }
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": max_tokens
+        }
+        if json_output:
+            payload["response_format"] = {"type": "json_object"}
+        start = time.perf_counter()
+        response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
+        response.raise_for_status()
+        data = response.json()
+        self.usage.record(label, data.get("usage", {}), time.perf_counter() - start)
+        return data["choices"][0]["message"]["content"].strip()
+
     def generate_content_with_openai(self, product, keywords):
         if not self.openai_api_key:
             return self.generate_fallback_content(product, keywords)
-        product_name = product['name']
-        product_category = product['category'].replace('-', ' ')
-        product_price = product['price']
-        keywords_str = ', '.join(keywords)
-        prompt = (
-            f"Write a concise, engaging 150-200 word blog post about the product \"{product_name}\" "
-            f"which is in the {product_category} category and priced at {product_price}. "
-            "The post should have an attention-grabbing introduction, "
-            "highlight key features and benefits, include a call to action, "
-            f"and naturally incorporate these keywords: {keywords_str}. "
-            "Format the response as a complete blog post with paragraphs."
-        )
+        messages = self.prompt_builder.build_messages(product, keywords)
+        max_tokens = self.prompt_builder.max_tokens()
+        if self.usage.would_exceed_budget(self.prompt_builder.estimate_prompt_tokens(messages), max_tokens):
+            logging.warning(f"OpenAI budget exhausted, using fallback content for: {product['name']}")
+            self.usage.record_fallback()
+            return self.generate_fallback_content(product, keywords)
+        try:
+            return self._chat_completion(messages, max_tokens, product['name'])
+        except Exception as e:
+            logging.error(f"Error generating content with OpenAI: {e}")
+            self.usage.record_fallback()
+            return self.generate_fallback_content(product, keywords)
+
+    def stream_content_with_openai(self, product, keywords):
+        """Yield post content in chunks as the completion streams in (server-sent events).
+
+        An error before the first chunk falls back to template content; an error after it
+        is re-raised, so callers can tell a truncated post from a complete one.
+        """
+        if not self.openai_api_key:
+            yield self.generate_fallback_content(product, keywords)
+            return
+        messages = self.prompt_builder.build_messages(product, keywords)
+        max_tokens = self.prompt_builder.max_tokens()
+        if self.usage.would_exceed_budget(self.prompt_builder.estimate_prompt_tokens(messages), max_tokens):
+            logging.warning(f"OpenAI budget exhausted, using fallback content for: {product['name']}")
+            self.usage.record_fallback()
+            yield self.generate_fallback_content(product, keywords)
+            return
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.openai_api_key}"
         }
         payload = {
             "model": self.model,
-            "messages": [
-                {"role": "system", "content": "You are a professional content writer specializing in SEO-friendly product reviews."},
-                {"role": "user", "content": prompt}
-            ],
+            "messages": messages,
             "temperature": 0.7,
-            "max_tokens": 500
+            "max_tokens": max_tokens,
+            "stream": True,
+            "stream_options": {"include_usage": True}
         }
+        start = time.perf_counter()
+        first_token_latency = None
+        usage = {}
         try:
-            response = requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload)
-            response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"].strip()
-            return content
+            with requests.post("https://api.openai.com/v1/chat/completions", headers=headers, json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("usage"):
+                        usage = event["usage"]
+                    for choice in event.get("choices", []):
+                        delta = choice.get("delta", {}).get("content")
+                        if delta:
+                            if first_token_latency is None:
+                                first_token_latency = time.perf_counter() - start
+                            yield delta
         except Exception as e:
-            logging.error(f"Error generating content with OpenAI: {e}")
-            return self.generate_fallback_content(product, keywords)
+            logging.error(f"Error streaming content from OpenAI: {e}")
+            if first_token_latency is not None:
+                # The streamed tokens are billed even though the post is incomplete.
+                self.usage.record(product['name'], usage, time.perf_counter() - start, first_token_latency)
+                raise
+            self.usage.record_fallback()
+            yield self.generate_fallback_content(product, keywords)
+            return
+        self.usage.record(product['name'], usage, time.perf_counter() - start, first_token_latency)
+
+    def generate_contents_batch(self, items, retries=1):
+        """Generate content for several (product, keywords) pairs in a single request.
+
+        Items whose post is missing or unparseable in the response are re-sent
+        together up to `retries` times; anything still missing gets fallback content.
+        """
+        if not self.openai_api_key:
+            return [self.generate_fallback_content(product, keywords) for product, keywords in items]
+        contents = [None] * len(items)
+        pending = list(range(len(items)))
+        for attempt in range(retries + 1):
+            if not pending:
+                break
+            batch = [items[i] for i in pending]
+            messages = self.prompt_builder.build_batch_messages(batch)
+            max_tokens = self.prompt_builder.max_tokens(len(batch))
+            if self.usage.would_exceed_budget(self.prompt_builder.estimate_prompt_tokens(messages), max_tokens):
+                logging.warning(f"OpenAI budget exhausted, using fallback content for {len(pending)} products")
+                break
+            try:
+                text = self._chat_completion(messages, max_tokens, f"batch of {len(batch)}", json_output=True)
+                parsed = self.prompt_builder.parse_batch_response(text, len(batch))
+            except Exception as e:
+                logging.error(f"Error generating batch content with OpenAI: {e}")
+                parsed = {}
+            failed = []
+            for position, index in enumerate(pending):
+                if parsed.get(position):
+                    contents[index] = parsed[position]
+                else:
+                    failed.append(index)
+            if failed and attempt < retries:
+                logging.warning(f"{len(failed)} of {len(pending)} batch items failed to parse, retrying them")
+            pending = failed
+        for index in pending:
+            self.usage.record_fallback()
+            contents[index] = self.generate_fallback_content(*items[index])
+        return contents
     
     def generate_fallback_content(self, product, keywords):
         product_name = product['name']
@@ -102,33 +204,63 @@ class BlogContentGenerator:
         )
         return blog_content
     
-    def generate_blog_posts(self, products_file="data/product_keywords.csv", output_file="data/blog_posts.json"):
+    @staticmethod
+    def parse_keywords(product):
+        # Product records and queue payloads carry a list; older CSV rows a comma-separated string
+        return split_keywords(product.get('keywords'))
+
+    def generate_blog_post(self, product, content=None):
+        product = Product.coerce(product)
+        logging.info(f"Generating blog post for: {product.name}")
+        title = self.generate_blog_title(product)
+        if content is None:
+            content = self.generate_content_with_openai(product, product.keywords)
+        return BlogPost(
+            title=title,
+            content=content,
+            product_name=product.name,
+            product_price=product.price,
+            product_url=product.url,
+            product_image_url=product.image_url,
+            keywords=list(product.keywords),
+            category=product.category,
+            date_created=datetime.now().strftime("%Y-%m-%d")
+        )
+
+    def generate_blog_posts(self, products_file="data/product_keywords.csv", output_file="data/blog_posts.json", batch_size=None, on_post=None, products=None):
+        """Generate posts for every product in `products`, or in products_file if not given.
+
+        If `on_post` is given it is called with each post as soon as it is
+        generated, so callers can publish without waiting for the whole run.
+        Posts that near-duplicate an earlier post of the run are flagged with
+        `duplicate_of` and not passed to `on_post`.
+        """
         try:
-            df = pd.read_csv(products_file)
-            products = df.to_dict(orient='records')
+            if products is None:
+                products = read_products_csv(products_file)
+            products = [Product.coerce(p) for p in products]
+            if batch_size is None:
+                batch_size = int(os.getenv("OPENAI_BATCH_SIZE", "1"))
+            batch_size = max(1, min(batch_size, self.prompt_builder.max_batch_size()))
             blog_posts = []
-            for product in products:
-                logging.info(f"Generating blog post for: {product['name']}")
-                keywords = [k.strip() for k in product.get('keywords', '').split(',') if k.strip()]
-                title = self.generate_blog_title(product)
-                content = self.generate_content_with_openai(product, keywords)
-                blog_post = {
-                    'title': title,
-                    'content': content,
-                    'product_name': product['name'],
-                    'product_price': product['price'],
-                    'product_url': product.get('url', ''),
-                    'product_image_url': product.get('image_url', ''),
-                    'keywords': keywords,
-                    'category': product['category'],
-                    'date_created': datetime.now().strftime("%Y-%m-%d")
-                }
-                blog_posts.append(blog_post)
+            duplicates = PostDeduplicator()
+            for i in range(0, len(products), batch_size):
+                chunk = products[i:i + batch_size]
+                if batch_size == 1:
+                    new_posts = [self.generate_blog_post(chunk[0])]
+                else:
+                    logging.info(f"Generating batch of {len(chunk)} blog posts")
+                    contents = self.generate_contents_batch([(p, p.keywords) for p in chunk])
+                    new_posts = [self.generate_blog_post(p, c) for p, c in zip(chunk, contents)]
+                for blog_post in new_posts:
+                    if not duplicates.flag(blog_post) and on_post:
+                        on_post(blog_post)
+                    blog_posts.append(blog_post)
                 time.sleep(2)
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(blog_posts, f, indent=2)
+            write_posts_json(blog_posts, output_file)
             logging.info(f"Generated {len(blog_posts)} blog posts and saved to {output_file}")
+            if self.openai_api_key:
+                self.usage.save_report(os.path.join(os.path.dirname(output_file), "generation_report.json"))
             return blog_posts
         except Exception as e:
             logging.error(f"Error generating blog posts: {e}")
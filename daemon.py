@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+from flask import Flask, jsonify, request
+from dotenv import load_dotenv
+from dedup import ProductDeduplicator, normalize_name, jaccard
+from publish_ledger import post_id
+from prompt_builder import UsageTracker
+from records import BlogPost, read_products_csv, read_posts_json, write_posts_json
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+USE_MOCK_DATA = os.getenv("USE_MOCK_DATA", "True").lower() == "true"
+DAEMON_STATE_FILE = os.getenv("DAEMON_STATE_FILE", "data/daemon_state.json")
+DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "5001"))
+# A category whose list turns over completely every MIN interval is refreshed that
+# often; one that never changes backs off to the MAX interval.
+MIN_REFRESH_INTERVAL = float(os.getenv("DAEMON_MIN_INTERVAL", "3600"))
+MAX_REFRESH_INTERVAL = float(os.getenv("DAEMON_MAX_INTERVAL", "86400"))
+# Weight of the newest observation in the smoothed change rate.
+CHANGE_SMOOTHING = 0.3
+DEFAULT_CATEGORIES = ["electronics", "home-kitchen", "fashion", "toys-games", "beauty"]
+
+
+class CategorySchedule:
+    """Refresh schedule for one category, adapted to how much its bestseller list churns"""
+
+    def __init__(self, category, change_rate=0.5, next_run=0.0, last_run=None, fingerprint=None, checks=0, changes=0):
+        self.category = category
+        self.change_rate = change_rate
+        self.next_run = next_run
+        self.last_run = last_run
+        self.fingerprint = fingerprint
+        self.checks = checks
+        self.changes = changes
+
+    @property
+    def interval(self):
+        rate = max(self.change_rate, MIN_REFRESH_INTERVAL / MAX_REFRESH_INTERVAL)
+        return min(MAX_REFRESH_INTERVAL, MIN_REFRESH_INTERVAL / rate)
+
+    def observe(self, names, now=None):
+        """Record a fresh list and reschedule; returns the fraction of the list that changed"""
+        now = now or time.time()
+        current = sorted({normalize_name(n) for n in names})
+        churn = None
+        if self.fingerprint is not None:
+            churn = 1 - jaccard(set(current), set(self.fingerprint))
+            # change_rate is churn per MIN interval. A check soon after the previous one
+            # (e.g. a manual /run) covers little time, so it is scaled up and weighted down
+            # instead of reading as "nothing changed".
+            elapsed = max(now - (self.last_run or now), 1.0)
+            window = min(1.0, elapsed / MIN_REFRESH_INTERVAL)
+            rate = min(1.0, churn / window)
+            weight = CHANGE_SMOOTHING * window
+            self.change_rate = (1 - weight) * self.change_rate + weight * rate
+            self.changes += churn > 0
+        self.fingerprint = current
+        self.checks += 1
+        self.last_run = now
+        self.next_run = now + self.interval
+        return churn
+
+    def retry_later(self, now=None):
+        # A failed fetch says nothing about churn; try again at the shortest interval.
+        self.next_run = (now or time.time()) + MIN_REFRESH_INTERVAL
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class PipelineDaemon:
+    """Keeps the pipeline clients warm and refreshes categories on their own schedules"""
+
+    def __init__(self, categories=None, state_file=DAEMON_STATE_FILE, limit=5, posts_file="data/blog_posts.json"):
+        self.state_file = state_file
+        self.limit = limit
+        self.posts_file = posts_file
+        self.schedules = {}
+        if os.path.exists(state_file):
+            with open(state_file, encoding='utf-8') as f:
+                self.schedules = {c: CategorySchedule.from_dict(s) for c, s in json.load(f).items()}
+        for category in categories or DEFAULT_CATEGORIES:
+            self.schedules.setdefault(category, CategorySchedule(category))
+        self.triggers = queue.Queue()
+        self.stop_event = threading.Event()
+        self.status = {'started_at': time.time(), 'running': None, 'runs': 0, 'last_run': None}
+        self.status_lock = threading.Lock()
+        # Built on the scheduler thread at its first run: the ledger and search index hold
+        # SQLite connections that must stay on the thread that opened them.
+        self.processor = None
+
+    def warm_up(self):
+        from scraper import AmazonProductScraper
+        from related_posts import RelatedPosts
+        from work_queue import PipelineProcessor
+
+        start = time.perf_counter()
+        self.scraper = AmazonProductScraper()
+        self.deduplicator = ProductDeduplicator()
+        self.processor = PipelineProcessor()
+        self.related = RelatedPosts()
+        self.posts = {}
+        if os.path.exists(self.posts_file):
+            self.posts = {post_id(p): p for p in read_posts_json(self.posts_file)}
+        for post in self.posts.values():
+            self.processor.post_dedup.add(post)
+        logging.info(f"Daemon warmed up in {time.perf_counter() - start:.1f}s with {len(self.posts)} posts loaded.")
+
+    def save_state(self):
+        if os.path.dirname(self.state_file):
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with open(self.state_file, 'w', encoding='utf-8') as f:
+            json.dump({c: s.to_dict() for c, s in self.schedules.items()}, f, indent=2)
+
+    def fetch_products(self, category):
+        if USE_MOCK_DATA:
+            products = read_products_csv("data/trending_products.csv")
+            return [p for p in products if p.category == category][:self.limit]
+        return self.scraper.get_bestsellers_by_category(category)[:self.limit]
+
+    def run_category(self, category):
+        """Refresh one category and publish posts for products that do not have one yet"""
+        if self.processor is None:
+            self.warm_up()
+        schedule = self.schedules.setdefault(category, CategorySchedule(category))
+        products = self.fetch_products(category)
+        if not products:
+            schedule.retry_later()
+            self.save_state()
+            logging.warning(f"No products fetched for '{category}', retrying in {MIN_REFRESH_INTERVAL:.0f}s.")
+            return []
+
+        churn = schedule.observe(p.name for p in products)
+        self.save_state()
+        # Bestseller lists overlap across categories, and post IDs include the category,
+        # so products are also matched against every product that already has a post.
+        products, _ = self.deduplicator.deduplicate(products, known=[p.product_name for p in self.posts.values()])
+        # The ledger already knows every published post, so only new products cost API calls.
+        new_products = [
+            p for p in products
+            if self.processor.publisher.ledger.get(post_id({'category': p.category, 'product_name': p.name}), 'html') is None
+        ]
+        logging.info(
+            f"Category '{category}': churn {'n/a' if churn is None else f'{churn:.0%}'}, "
+            f"{len(new_products)} new products, next refresh in {schedule.interval / 3600:.1f}h."
+        )
+
+        # OPENAI_TOKEN_BUDGET / OPENAI_COST_BUDGET cap one run, not the daemon's lifetime.
+        generator = self.processor.generator
+        generator.usage = UsageTracker.from_env(generator.model)
+        new_posts = []
+        for product in new_products:
+            payload = {'product': product.to_dict()}
+            try:
+                for stage in ("keywords", "generate", "publish"):
+                    payload = self.processor.run_stage(stage, payload)
+            except Exception as e:
+                logging.error(f"Error processing '{product.name}': {e}")
+                continue
+            post = BlogPost.from_dict(payload['post'])
+            self.posts[post_id(post)] = post
+            if not post.duplicate_of:
+                new_posts.append(post)
+        if generator.openai_api_key and new_products:
+            generator.usage.save_report(os.path.join(os.path.dirname(self.posts_file), "generation_report.json"))
+
+        if new_posts:
+            self.related.add_posts(new_posts)
+            self.related.save()
+            # Neighbours' related lists change too; the ledger skips pages that did not.
+            for post in self.related.annotate([p for p in self.posts.values() if not p.duplicate_of]):
+                self.processor.publisher.save_as_html(post)
+            write_posts_json(list(self.posts.values()), self.posts_file)
+        return new_posts
+
+    def trigger(self, category=None):
+        """Queue a run of one category, or of every category when category is None"""
+        if category is not None and category not in self.schedules:
+            raise ValueError(f"Unknown category: {category}")
+        self.triggers.put(category)
+
+    def _run(self, category):
+        with self.status_lock:
+            self.status['running'] = category
+        start = time.time()
+        try:
+            new_posts = self.run_category(category)
+        except Exception as e:
+            logging.error(f"Run for '{category}' failed: {e}")
+            self.schedules[category].retry_later()
+            new_posts = []
+        with self.status_lock:
+            self.status.update(running=None, runs=self.status['runs'] + 1, last_run={
+                'category': category, 'started_at': start, 'duration_s': round(time.time() - start, 2), 'new_posts': len(new_posts)
+            })
+
+    def loop(self):
+        """Run due categories in order of due time, and triggered runs as soon as they arrive"""
+        while not self.stop_event.is_set():
+            due = min(self.schedules.values(), key=lambda s: s.next_run)
+            wait = max(0.0, due.next_run - time.time())
+            try:
+                # Capped so that stop() is noticed within a second.
+                requested = self.triggers.get(timeout=min(wait, 1.0))
+            except queue.Empty:
+                if wait <= 1.0 and time.time() >= due.next_run:
+                    self._run(due.category)
+                continue
+            for category in ([requested] if requested else list(self.schedules)):
+                self._run(category)
+
+    def start(self):
+        thread = threading.Thread(target=self.loop, name="scheduler", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stop_event.set()
+
+    def snapshot(self):
+        with self.status_lock:
+            status = dict(self.status)
+        now = time.time()
+        status['categories'] = {
+            c: {
+                'change_rate': round(s.change_rate, 3),
+                'interval_s': round(s.interval),
+                'next_run_in_s': round(max(0.0, s.next_run - now)),
+                'checks': s.checks,
+                'changes': s.changes
+            }
+            for c, s in self.schedules.items()
+        }
+        status['queued_triggers'] = self.triggers.qsize()
+        return status
+
+
+def create_control_app(daemon):
+    app = Flask(__name__)
+
+    @app.route("/status")
+    def status():
+        return jsonify(daemon.snapshot())
+
+    @app.route("/run", methods=["POST"])
+    def run():
+        category = request.args.get("category") or (request.get_json(silent=True) or {}).get("category")
+        try:
+            daemon.trigger(category)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 404
+        return jsonify({'queued': category or 'all'}), 202
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline as a long-lived scheduler with a control API")
+    parser.add_argument("--categories", nargs="*", default=None)
+    parser.add_argument("--limit", type=int, default=5, help="Products taken from each bestseller list")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    args = parser.parse_args()
+
+    pipeline_daemon = PipelineDaemon(args.categories, limit=args.limit)
+    pipeline_daemon.start()
+    create_control_app(pipeline_daemon).run(host=args.host, port=args.port, threaded=True)
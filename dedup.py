@@ -0,0 +1,188 @@
+import re
+import struct
+import hashlib
+import logging
+from collections import defaultdict
+import numpy as np
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Variant details that make otherwise identical listings look different.
+COLOR_WORDS = {
+    "black", "white", "grey", "gray", "silver", "gold", "red", "blue", "green", "pink",
+    "purple", "yellow", "orange", "brown", "beige", "navy", "rose", "teal", "ivory", "charcoal"
+}
+SIZE_WORDS = {"xs", "s", "m", "l", "xl", "xxl", "xxxl", "small", "medium", "large", "size", "pack", "count", "ct", "pcs", "piece", "pieces"}
+STOP_WORDS = {"the", "a", "an", "and", "with", "for", "of", "in", "by", "to"}
+VARIANT_PATTERN = re.compile(r"\b\d+(\.\d+)?\s*(-?\s*(pack|count|ct|pcs|piece|pieces|oz|ml|l|lb|lbs|inch|in|cm|mm|qt|quart|gb|tb))\b")
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def normalize_name(name):
+    """Lowercase, drop variant details (sizes, colors, pack counts) and punctuation"""
+    text = str(name).lower()
+    text = VARIANT_PATTERN.sub(" ", text)
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    words = [w for w in text.split() if w not in COLOR_WORDS and w not in SIZE_WORDS and w not in STOP_WORDS]
+    return " ".join(words)
+
+
+def char_shingles(text, k=4):
+    text = f" {text} "
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def word_shingles(text, k=5):
+    words = re.sub(r"[^a-z0-9]+", " ", str(text).lower()).split()
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHashLSH:
+    """MinHash signatures bucketed by LSH bands to find candidate near-duplicates in ~O(n)"""
+
+    def __init__(self, num_perm=64, bands=16, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Universal hash family h(x) = (a*x + b) mod p, one (a, b) pair per permutation,
+        # evaluated for all permutations at once with numpy (uint64 products wrap, which
+        # keeps the family well mixed, as in the usual MinHash implementations).
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.buckets = defaultdict(list)
+
+    def signature(self, shingles):
+        if not shingles:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.fromiter(
+            (struct.unpack("<I", hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest())[0] for s in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = np.bitwise_and((np.outer(self.a, hashes) + self.b[:, None]) % np.uint64(MERSENNE_PRIME), np.uint64(MAX_HASH))
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def query(self, signature):
+        """Keys sharing at least one band with the signature"""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self.buckets.get(band_key, ()))
+        return candidates
+
+    def insert(self, key, signature):
+        for band_key in self._band_keys(signature):
+            self.buckets[band_key].append(key)
+
+
+class ProductDeduplicator:
+    """Collapse repeated or near-identical products before the paid pipeline stages"""
+
+    def __init__(self, threshold=0.8, num_perm=64, bands=16):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+
+    def deduplicate(self, products, known=()):
+        """Return (unique_products, duplicates) where duplicates maps a dropped name to the kept one.
+
+        Products matching a name in `known` (e.g. products that already have a post) are
+        dropped as well; known names are never returned themselves.
+        """
+        lsh = MinHashLSH(self.num_perm, self.bands)
+        seen_hashes = {}
+        kept = []
+        kept_names = []
+        kept_shingles = []
+        duplicates = {}
+        candidates = [(name, None) for name in known] + [(product.get('name', ''), product) for product in products]
+        for name, product in candidates:
+            normalized = normalize_name(name)
+            digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+            if digest in seen_hashes:
+                if product is not None:
+                    duplicates[name] = kept_names[seen_hashes[digest]]
+                continue
+            shingles = char_shingles(normalized)
+            signature = lsh.signature(shingles)
+            match = None
+            # LSH only proposes candidates; confirm with the exact Jaccard similarity.
+            for candidate in lsh.query(signature):
+                if jaccard(shingles, kept_shingles[candidate]) >= self.threshold:
+                    match = candidate
+                    break
+            if match is not None:
+                if product is not None:
+                    duplicates[name] = kept_names[match]
+                continue
+            seen_hashes[digest] = len(kept_names)
+            lsh.insert(len(kept_names), signature)
+            kept_names.append(name)
+            kept_shingles.append(shingles)
+            if product is not None:
+                kept.append(product)
+        if duplicates:
+            logging.info(f"Dedup removed {len(duplicates)} of {len(products)} products as duplicates.")
+        return kept, duplicates
+
+
+class PostDeduplicator:
+    """Incremental near-duplicate check of each new post against every post added so far,
+    so a post can be flagged before it is published rather than after the whole run"""
+
+    def __init__(self, posts=(), threshold=0.85, num_perm=128, bands=32):
+        self.threshold = threshold
+        self.lsh = MinHashLSH(num_perm, bands)
+        self.titles = []
+        self.shingle_sets = []
+        for post in posts:
+            self.add(post)
+
+    def add(self, post):
+        """Index a post and return (title, similarity) of the earlier post it near-duplicates, or None"""
+        shingles = word_shingles(post.get('content', ''))
+        signature = self.lsh.signature(shingles)
+        best = None
+        for candidate in self.lsh.query(signature):
+            similarity = jaccard(shingles, self.shingle_sets[candidate])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (candidate, similarity)
+        self.lsh.insert(len(self.titles), signature)
+        self.titles.append(post.get('title', ''))
+        self.shingle_sets.append(shingles)
+        return None if best is None else (self.titles[best[0]], round(best[1], 3))
+
+    def flag(self, post):
+        """Index a post and set its 'duplicate_of' title if it near-duplicates an earlier one"""
+        match = self.add(post)
+        if match is None:
+            return False
+        post['duplicate_of'], similarity = match
+        logging.warning(f"Post '{post['title']}' is {similarity:.0%} similar to '{post['duplicate_of']}'; not publishing it.")
+        return True
+
+
+if __name__ == "__main__":
+    from records import read_products_csv
+
+    products = read_products_csv("data/trending_products.csv")
+    unique, duplicates = ProductDeduplicator().deduplicate(products)
+    print(f"{len(unique)} unique products out of {len(products)}")
+    for dropped, kept in duplicates.items():
+        print(f"  {dropped} -> {kept}")
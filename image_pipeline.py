@@ -0,0 +1,241 @@
+import os
+import json
+import html
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import requests
+from dotenv import load_dotenv
+from records import read_posts_json
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+    print("Pillow not available, images will be cached without thumbnails. Install with: pip install Pillow")
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Lives under the HTML output directory so pages can link to it relatively and
+# server.py serves it alongside the posts.
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "output/html/images")
+# Public URL the cache directory is reachable at, for WordPress and Medium posts.
+IMAGE_BASE_URL = os.getenv("IMAGE_BASE_URL")
+THUMBNAIL_WIDTHS = [320, 640, 1024]
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# Matches the 800px content column in the HTML template.
+IMAGE_SIZES = "(max-width: 800px) 100vw, 800px"
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/webp": ".webp",
+    "image/gif": ".gif",
+}
+
+
+def make_thumbnails(original_path, digest, output_dir, widths):
+    """Write WebP and JPEG variants of one image; runs in a worker process"""
+    variants = {'webp': [], 'jpeg': []}
+    with Image.open(original_path) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        if image.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel, so flatten transparency onto white.
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.split()[-1])
+            image = background
+        else:
+            image = image.convert("RGB")
+        for target in sorted({min(w, width) for w in widths}):
+            resized = None
+            for fmt, ext, options in (("webp", "webp", {'quality': WEBP_QUALITY, 'method': 4}),
+                                      ("jpeg", "jpg", {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True})):
+                name = f"{digest}-{target}.{ext}"
+                path = os.path.join(output_dir, name)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = image if target == width else image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+                    resized.save(path, fmt.upper(), **options)
+                variants[fmt].append([target, name])
+    return digest, {'width': width, 'height': height, 'variants': variants}
+
+
+def picture_html(record, base_url, alt):
+    """<picture> with WebP and JPEG srcsets for a cached image record"""
+    alt = html.escape(alt or "", quote=True)
+    if not record.get('variants', {}).get('jpeg'):
+        return f'<img src="{base_url}/{record["original"]}" alt="{alt}" loading="lazy" decoding="async">'
+    webp = ", ".join(f"{base_url}/{name} {w}w" for w, name in record['variants']['webp'])
+    jpeg = ", ".join(f"{base_url}/{name} {w}w" for w, name in record['variants']['jpeg'])
+    # Middle size as the fallback src; the largest size gives the intrinsic aspect ratio.
+    fallback = record['variants']['jpeg'][len(record['variants']['jpeg']) // 2][1]
+    width = record['variants']['jpeg'][-1][0]
+    height = max(1, round(record['height'] * width / record['width']))
+    return (
+        f'<picture><source type="image/webp" srcset="{webp}" sizes="{IMAGE_SIZES}">'
+        f'<img src="{base_url}/{fallback}" srcset="{jpeg}" sizes="{IMAGE_SIZES}" '
+        f'width="{width}" height="{height}" alt="{alt}" loading="lazy" decoding="async"></picture>'
+    )
+
+
+class ImagePipeline:
+    """Fetches product images once into a content-addressed cache and builds responsive thumbnails"""
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, widths=None, workers=None, fetch_workers=None, session=None):
+        self.cache_dir = cache_dir
+        self.originals_dir = os.path.join(cache_dir, "originals")
+        self.widths = widths or THUMBNAIL_WIDTHS
+        self.workers = workers or int(os.getenv("IMAGE_WORKERS", os.cpu_count() or 1))
+        self.fetch_workers = fetch_workers or int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", "Mozilla/5.0 (compatible; seo-blog-pipeline)")
+        # Append-only journal, so each process only writes what it learned and never
+        # has to re-read or rewrite the whole manifest.
+        self.manifest_path = os.path.join(cache_dir, "manifest.jsonl")
+        os.makedirs(self.originals_dir, exist_ok=True)
+        # urls: source URL -> content digest; images: digest -> original file, size and variants
+        self.manifest = {'urls': {}, 'images': {}}
+        self.load_manifest()
+
+    def _merge(self, entry):
+        if 'url' in entry:
+            self.manifest['urls'][entry['url']] = entry['digest']
+            return
+        record = entry['record']
+        # A finished (or permanently failed) record wins over a bare one from another process.
+        if 'variants' in record or 'failed' in record or entry['digest'] not in self.manifest['images']:
+            self.manifest['images'][entry['digest']] = record
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self._merge(json.loads(line))
+                except (ValueError, KeyError):
+                    logging.warning(f"Skipping unreadable line in {self.manifest_path}")
+
+    def save_manifest(self, entries):
+        """Append manifest entries in a single write"""
+        if not entries:
+            return
+        with open(self.manifest_path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def fetch(self, url):
+        """Download one image into the cache and return (url, digest, original filename), or None"""
+        try:
+            response = self.session.get(url, timeout=15)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            logging.warning(f"Could not fetch image {url}: {e}")
+            return None
+        content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if not content_type.startswith("image/") or len(response.content) > MAX_IMAGE_BYTES:
+            logging.warning(f"Skipping {url}: not an image or too large ({content_type}, {len(response.content)} bytes)")
+            return None
+        digest = hashlib.sha256(response.content).hexdigest()[:32]
+        original = f"originals/{digest}{CONTENT_TYPE_EXTENSIONS.get(content_type, '.img')}"
+        path = os.path.join(self.cache_dir, original)
+        # Identical bytes behind different URLs land on the same file.
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(response.content)
+            os.replace(tmp_path, path)
+        return url, digest, original
+
+    def prefetch(self, urls):
+        """Fetch new URLs and build thumbnails for the images behind `urls`; returns the number thumbnailed.
+
+        Only the given URLs' images are considered, so a queue worker handling one item does
+        not pick up other items' images. Images Pillow cannot decode are marked failed and
+        are not retried.
+        """
+        urls = {u for u in urls if isinstance(u, str) and u.startswith("http")}
+        pending = sorted(u for u in urls if u not in self.manifest['urls'])
+        entries = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+                for result in pool.map(self.fetch, pending):
+                    if result is None:
+                        continue
+                    url, digest, original = result
+                    self.manifest['urls'][url] = digest
+                    entries.append({'url': url, 'digest': digest})
+                    if digest not in self.manifest['images']:
+                        self.manifest['images'][digest] = {'original': original}
+                        entries.append({'digest': digest, 'record': self.manifest['images'][digest]})
+
+        digests = {self.manifest['urls'][u] for u in urls if u in self.manifest['urls']}
+        missing = sorted(d for d in digests if not {'variants', 'failed'} & self.manifest['images'][d].keys())
+        if missing and PIL_AVAILABLE:
+            jobs = [(os.path.join(self.cache_dir, self.manifest['images'][d]['original']), d, self.cache_dir, self.widths) for d in missing]
+            if len(jobs) == 1 or self.workers == 1:
+                # Not worth starting a pool for a single image (e.g. one queue item at a time).
+                results = [self._run_thumbnail_job(job) for job in jobs]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    futures = [pool.submit(make_thumbnails, *job) for job in jobs]
+                    results = [self._wait_thumbnail_job(future) for future in futures]
+            for digest, result in zip(missing, results):
+                record = self.manifest['images'][digest]
+                if result is None:
+                    record['failed'] = True
+                else:
+                    record.update(result[1])
+                entries.append({'digest': digest, 'record': record})
+        self.save_manifest(entries)
+        logging.info(f"Image cache: {len(pending)} new URLs, {len(missing)} images thumbnailed, {len(self.manifest['images'])} images total.")
+        return len(missing) if PIL_AVAILABLE else 0
+
+    @staticmethod
+    def _run_thumbnail_job(job):
+        try:
+            return make_thumbnails(*job)
+        except Exception as e:
+            logging.warning(f"Could not create thumbnails for {job[0]}: {e}")
+            return None
+
+    @staticmethod
+    def _wait_thumbnail_job(future):
+        try:
+            return future.result()
+        except Exception as e:
+            logging.warning(f"Could not create thumbnails: {e}")
+            return None
+
+    def record_for(self, url):
+        digest = self.manifest['urls'].get(url)
+        if digest is None:
+            return None
+        return dict(self.manifest['images'][digest], digest=digest)
+
+    def attach(self, post):
+        """Set post['images'] to the cached image record for its product image, if there is one"""
+        record = self.record_for(post.get('product_image_url'))
+        if record is not None:
+            post['images'] = record
+        return post
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch and resize product images into the local cache")
+    parser.add_argument("--posts", default="data/blog_posts.json", help="Blog posts JSON to take product_image_url from")
+    args = parser.parse_args()
+    blog_posts = read_posts_json(args.posts)
+    pipeline = ImagePipeline()
+    pipeline.prefetch(p.get('product_image_url') for p in blog_posts)
+    for blog_post in blog_posts[:3]:
+        pipeline.attach(blog_post)
+        if blog_post.get('images'):
+            print(picture_html(blog_post['images'], "images", blog_post['product_name']))
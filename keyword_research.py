@@ -1,10 +1,11 @@
 import requests 
-import pandas as pd
 import os 
 import time 
 import json 
 from collections import Counter 
 from dotenv import load_dotenv 
+from provider_router import ProviderRouter
+from records import Product, read_products_csv, write_products_csv
 
 load_dotenv()
 
@@ -15,12 +16,24 @@ class KeywordResearchTool:
         
         if not self.serpapi_key and not self.serper_key:
             print("Warning: No API keys found. Will use fallback keyword generation method.")
-            
-    def get_keywords_from_serpapi(self, query, limit=5):
-        if not self.serpapi_key:
-            print("SerpAPI key not found.")
-            return []
         
+        # Per-request timeout; there was none before, so a hung provider stalled every product
+        self.timeout = float(os.getenv("KEYWORD_API_TIMEOUT", "5"))
+        providers = []
+        if self.serpapi_key:
+            providers.append(("serpapi", self.fetch_keywords_from_serpapi))
+        if self.serper_key:
+            providers.append(("serper", self.fetch_keywords_from_serper))
+        hedge_after = os.getenv("KEYWORD_HEDGE_AFTER")
+        self.router = ProviderRouter(
+            providers,
+            hedge_after=float(hedge_after) if hedge_after else None,
+            failure_threshold=int(os.getenv("KEYWORD_BREAKER_FAILURES", "3")),
+            cooldown=float(os.getenv("KEYWORD_BREAKER_COOLDOWN", "60"))
+        )
+            
+    def fetch_keywords_from_serpapi(self, query, limit=5):
+        """Raises on any request failure so the router can count it against SerpAPI"""
         url = "https://serpapi.com/search.json"
         params = {
             "engine": "google",
@@ -32,32 +45,19 @@ class KeywordResearchTool:
             "location": "United States"
         }
         
-        try: 
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            related_searches = []
-            if "related_searches" in data:
-                related_searches = [item["query"] for item in data["related_searches"]]
-                
-                questions = []
-                if "related_questions" in data:
-                    questions = [item["question"] for item in data["related_questions"]]
-                    
-                    keywords = related_searches + questions
-                    return keywords[:limit]
-                
-        except Exception as e:
-            print(f"Error fetching keywords from SerpAPI: {str(e)}")
-            return []
+        response = requests.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
         
-    def get_keywords_from_serper(self, query, limit=5):
-        if not self.serper_key:
-            print("Serper API key not found.")
-            return []
+        related_searches = [item["query"] for item in data.get("related_searches", []) if item.get("query")]
+        questions = [item["question"] for item in data.get("related_questions", []) if item.get("question")]
         
-        url = "https://serpapi.serper.dev/search"
+        keywords = related_searches + questions
+        return keywords[:limit]
+    
+    def fetch_keywords_from_serper(self, query, limit=5):
+        """Raises on any request failure so the router can count it against Serper"""
+        url = "https://google.serper.dev/search"
         headers = {
             "X-API-KEY": self.serper_key,
             "Content-Type": "application/json"
@@ -68,18 +68,34 @@ class KeywordResearchTool:
             "hl": "en"
         }
         
+        response = requests.post(url, headers=headers, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        
+        related_searches = [item["query"] for item in data.get("relatedSearches", []) if item.get("query")]
+        questions = [item["question"] for item in data.get("peopleAlsoAsk", []) if item.get("question")]
+        
+        keywords = related_searches + questions
+        return keywords[:limit]
+    
+    def get_keywords_from_serpapi(self, query, limit=5):
+        if not self.serpapi_key:
+            print("SerpAPI key not found.")
+            return []
+        
         try: 
-            response = requests.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            related_searches = []
-            if "related_searches" in data:
-                related_searches = [item for item in data["peopleAlsoAsk"]]
-                
-            keywords = related_searches + questions
-            return keywords[:limit]
+            return self.fetch_keywords_from_serpapi(query, limit)
+        except Exception as e:
+            print(f"Error fetching keywords from SerpAPI: {str(e)}")
+            return []
         
+    def get_keywords_from_serper(self, query, limit=5):
+        if not self.serper_key:
+            print("Serper API key not found.")
+            return []
+        
+        try: 
+            return self.fetch_keywords_from_serper(query, limit)
         except Exception as e:
             print(f"Error fetching keywords from Serper API: {str(e)}")
             return []
@@ -139,16 +155,11 @@ class KeywordResearchTool:
         
         keywords = []
         
-        if use_api and (self.serpapi_key or self.serper_key):
-            if self.serpapi_key:
-                serpapi_keywords = self.get_keywords_from_serpapi(search_query)
-                if serpapi_keywords:
-                    keywords.extend(serpapi_keywords)
-                    
-            if self.serper_key and len(keywords) < 5:
-                serper_keywords = self.get_keywords_from_serper(search_query)
-                if serper_keywords:
-                    keywords.extend(serper_keywords)
+        if use_api and self.router.providers:
+            # Healthy providers in order (SerpAPI first); open circuits are skipped without a request
+            api_keywords = self.router.call(search_query, accept=lambda kws: len(kws) >= 3)
+            if api_keywords:
+                keywords.extend(api_keywords)
                     
         if len(keywords) < 3:
             fallback_keywords = self.generate_keywords_fallback(product_name, category)
@@ -170,23 +181,20 @@ class KeywordResearchTool:
         for product in products:
             keywords = self.research_keywords_for_product(product)
             
-            product_with_keywords = product.copy()
-            product_with_keywords['keywords'] = ', '.join(keywords)
-            results.append(product_with_keywords)
+            results.append(Product.coerce(product).with_keywords(keywords))
             
             time.sleep(1)
             
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        df = pd.DataFrame(results)
-        df.to_csv(output_file, index=False)
+        write_products_csv(results, output_file)
         print(f"Saved product keywords to {output_file}")
+        if self.router.providers:
+            print(f"Keyword provider stats: {json.dumps(self.router.stats())}")
         
         return results 
     
 if __name__ == "__main__":
     try:
-        products_df = pd.read_csv("data/trending_products.csv")
-        products = products_df.to_dict(orient='records')
+        products = read_products_csv("data/trending_products.csv")
         
         keyword_tool = KeywordResearchTool()
         products_with_keywords = keyword_tool.research_keywords_for_products(products)
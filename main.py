@@ -1,11 +1,14 @@
 import os
 import logging
-import time
-import pandas as pd
 from scraper import AmazonProductScraper
 from keyword_research import KeywordResearchTool
 from content_generator import BlogContentGenerator
 from publisher import BlogPublisher
+from dedup import ProductDeduplicator
+from related_posts import RelatedPosts
+from image_pipeline import ImagePipeline
+from publish_ledger import post_id
+from records import read_products_csv, read_posts_json, write_posts_json
 from dotenv import load_dotenv
 
 # Load configuration from .env
@@ -22,7 +25,7 @@ def main():
     if USE_MOCK_DATA:
         logging.info("Using mock product data as configured.")
         if os.path.exists("data/trending_products.csv"):
-            trending_products = pd.read_csv("data/trending_products.csv").to_dict(orient='records')
+            trending_products = read_products_csv("data/trending_products.csv")
         else:
             logging.error("No mock data available in data/trending_products.csv. Exiting.")
             return
@@ -33,7 +36,7 @@ def main():
         if not trending_products:
             logging.warning("Scraping failed: No products scraped. Falling back to mock data.")
             if os.path.exists("data/trending_products.csv"):
-                trending_products = pd.read_csv("data/trending_products.csv").to_dict(orient='records')
+                trending_products = read_products_csv("data/trending_products.csv")
             else:
                 logging.error("No mock data available. Exiting.")
                 return
@@ -41,20 +44,55 @@ def main():
         scraper.save_products_to_csv(trending_products, "data/trending_products.csv")
         logging.info("Trending products saved to data/trending_products.csv.")
 
+    # Collapse repeated and near-identical products before the paid stages
+    trending_products, _ = ProductDeduplicator().deduplicate(trending_products)
+
     # Step 2: SEO Keyword Research
     keyword_tool = KeywordResearchTool()
     logging.info("Researching SEO keywords for each product...")
     products_with_keywords = keyword_tool.research_keywords_for_products(trending_products, output_file="data/product_keywords.csv")
     
-    # Step 3: Generate Blog Posts
+    # Fetch each product image once into the local cache and build thumbnails
+    images = ImagePipeline()
+    images.prefetch(p.get('image_url') for p in trending_products)
+    
+    # Step 3 & 4: Generate Blog Posts and publish each one (save as HTML) as soon as it is ready
     generator = BlogContentGenerator()
+    publisher = BlogPublisher()
+    published_links = []
+
+    def publish(post):
+        images.attach(post)
+        html_link = publisher.save_as_html(post)  # Only save as HTML
+        published_links.append({"title": post["title"], "html": html_link})
+
+    # Posts from earlier runs, so their pages can be re-rendered when their related lists change
+    previous_posts = read_posts_json("data/blog_posts.json") if os.path.exists("data/blog_posts.json") else []
+
     logging.info("Generating blog posts for each product...")
-    blog_posts = generator.generate_blog_posts(products_file="data/product_keywords.csv", output_file="data/blog_posts.json")
+    blog_posts = generator.generate_blog_posts(products=products_with_keywords, output_file="data/blog_posts.json", on_post=publish)
     if not blog_posts:
         logging.error("No blog posts were generated. Exiting.")
         return
     logging.info(f"Generated {len(blog_posts)} blog posts.")
     
+    # Step 5: Link related posts. This run's pages were published before their related
+    # lists existed, and earlier runs' pages are rewritten when their lists changed.
+    # Posts flagged as near-duplicates were never published, so they are not linked either.
+    published_posts = [post for post in blog_posts if not post.get('duplicate_of')]
+    related = RelatedPosts()
+    updated = related.add_posts(published_posts)
+    updated.update(post_id(post) for post in published_posts)
+    related.save()
+    all_posts = {post_id(post): post for post in previous_posts}
+    all_posts.update((post_id(post), post) for post in blog_posts)
+    to_render = [post for pid, post in all_posts.items() if pid in updated and not post.get('duplicate_of')]
+    for post in related.annotate(to_render):
+        publisher.save_as_html(post)
+    logging.info(f"Rendered related links on {len(to_render)} pages.")
+    # Keep earlier runs' posts in blog_posts.json alongside this run's, as the daemon does
+    write_posts_json(list(all_posts.values()), "data/blog_posts.json")
+    
     # Display a sample blog post in the terminal
     logging.info("\n--- Sample Blog Post ---")
     sample = blog_posts[0]
@@ -63,14 +101,6 @@ def main():
     logging.info("Content:")
     logging.info(sample['content'])
     
-    # Step 4: Publish Blog Posts (Save as HTML only)
-    publisher = BlogPublisher()
-    published_links = []
-    for post in blog_posts:
-        html_link = publisher.save_as_html(post)  # Only save as HTML
-        published_links.append({"title": post["title"], "html": html_link})
-        time.sleep(1)
-    
     logging.info("Publishing complete. Summary of published posts:")
     for link in published_links:
         logging.info(link)
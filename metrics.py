@@ -0,0 +1,185 @@
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+
+# Upper bounds in seconds; fine at the low end where page and search requests sit,
+# coarse at the top for the SSE preview streams.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Label for requests that matched no route, so 404 scans cannot blow up label cardinality.
+UNMATCHED_ROUTE = "unmatched"
+# Responses that never carry a body, whatever their Content-Length says.
+BODILESS_STATUSES = frozenset(("204", "304"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+class RequestMetrics:
+    """Per-route request counters, latency histograms and bytes served, in Prometheus text format.
+
+    Recording a request only appends a tuple to a deque and touches a set, both atomic
+    under the GIL, so the request path takes no lock. Samples are folded into the
+    counters when /metrics is scraped, or every MAX_PENDING requests if it never is.
+    """
+
+    MAX_PENDING = 10000
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.active = set()
+        self.pending = deque()
+        self.requests = {}    # (route, method, status) -> count
+        self.latency = {}     # (route, method) -> [per-bucket counts..., +Inf count, sum]
+        self.bytes_out = {}   # (route, method) -> bytes
+
+    def request_started(self, token):
+        self.active.add(token)
+
+    def request_finished(self, token, route, method, status, duration, sent):
+        self.active.discard(token)
+        self.pending.append((route, method, status, duration, sent))
+        if len(self.pending) > self.MAX_PENDING and self.lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self.lock.release()
+
+    def _fold(self):
+        """Move pending samples into the counters; caller holds the lock"""
+        pending = self.pending
+        while True:
+            try:
+                route, method, status, duration, sent = pending.popleft()
+            except IndexError:
+                return
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            key = (route, method)
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = [0] * (len(self.buckets) + 2)
+            histogram[bisect_left(self.buckets, duration)] += 1
+            histogram[-1] += duration
+            self.bytes_out[key] = self.bytes_out.get(key, 0) + sent
+
+    def render(self):
+        with self.lock:
+            self._fold()
+            in_flight = len(self.active)
+            requests = dict(self.requests)
+            latency = {k: list(v) for k, v in self.latency.items()}
+            bytes_out = dict(self.bytes_out)
+
+        lines = [
+            "# HELP http_requests_total HTTP requests completed, by route, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for key, count in sorted(requests.items()):
+            lines.append(f"http_requests_total{{{_labels(('route', 'method', 'status'), key)}}} {count}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from receiving a request to sending the last byte.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for key, histogram in sorted(latency.items()):
+            labels = _labels(('route', 'method'), key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram):
+                cumulative += count
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += histogram[len(self.buckets)]
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram[-1]:.6f}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+        lines += [
+            "# HELP http_response_bytes_total Response body bytes sent, by route and method.",
+            "# TYPE http_response_bytes_total counter",
+        ]
+        for key, sent in sorted(bytes_out.items()):
+            lines.append(f"http_response_bytes_total{{{_labels(('route', 'method'), key)}}} {sent}")
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {in_flight}",
+            "# HELP process_start_time_seconds Start time of the process since the Unix epoch.",
+            "# TYPE process_start_time_seconds gauge",
+            f"process_start_time_seconds {self.started_at:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class _MeteredBody:
+    """Wraps one request's response: captures the status, counts bytes and records the request on close()"""
+
+    __slots__ = ("metrics", "environ", "start", "server_start_response", "body", "status", "length", "sent")
+
+    def __init__(self, metrics, environ, start, server_start_response):
+        self.metrics = metrics
+        self.environ = environ
+        self.start = start
+        self.server_start_response = server_start_response
+        self.body = ()
+        self.status = "500"
+        self.length = None
+        self.sent = 0
+
+    def start_response(self, status_line, headers, exc_info=None):
+        self.status = status_line[:3]
+        if self.status in BODILESS_STATUSES or self.environ.get("REQUEST_METHOD") == "HEAD":
+            # Content-Length describes the body a GET would get; the server sends none.
+            self.length = 0
+        else:
+            for name, value in headers:
+                if name == "Content-Length":
+                    self.length = int(value)
+                    break
+        return self.server_start_response(status_line, headers, exc_info)
+
+    def __iter__(self):
+        if self.length is not None:
+            # Size known up front: hand the body straight through with no per-chunk work.
+            return iter(self.body)
+        return self._counted()
+
+    def _counted(self):
+        for chunk in self.body:
+            self.sent += len(chunk)
+            yield chunk
+
+    def close(self):
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            self.metrics.request_finished(
+                id(self), self.environ.get("metrics.route", UNMATCHED_ROUTE), self.environ.get("REQUEST_METHOD", ""),
+                self.status, time.perf_counter() - self.start, self.sent if self.length is None else self.length
+            )
+
+
+class MetricsMiddleware:
+    """WSGI middleware feeding RequestMetrics; the app sets environ['metrics.route'] to the matched rule"""
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    def __call__(self, environ, start_response):
+        metered = _MeteredBody(self.metrics, environ, time.perf_counter(), start_response)
+        self.metrics.request_started(id(metered))
+        try:
+            metered.body = self.app(environ, metered.start_response)
+        except Exception:
+            metered.close()
+            raise
+        return metered
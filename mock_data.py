@@ -1,7 +1,6 @@
-import pandas as pd
 import os
-import json
 from datetime import datetime
+from records import Product, BlogPost, write_products_csv, write_posts_json
 
 def generate_mock_products(output_file="data/trending_products.csv"):
     """Generate mock product data to bypass scraping restrictions"""
@@ -90,20 +89,19 @@ def generate_mock_products(output_file="data/trending_products.csv"):
         }
     ]
     
-    # Create DataFrame and save to CSV
-    df = pd.DataFrame(mock_products)
-    df.to_csv(output_file, index=False)
+    # Validate and save to CSV
+    products = [Product.from_dict(p) for p in mock_products]
+    write_products_csv(products, output_file)
     print(f"Generated mock product data with {len(mock_products)} products")
     
     # Also create a mock product_keywords.csv file to ensure the pipeline continues
     keywords_file = os.path.join(os.path.dirname(output_file), "product_keywords.csv")
     products_with_keywords = []
     
-    for product in mock_products:
-        product_copy = product.copy()
+    for product in products:
         # Generate mock keywords based on product name and category
-        name_parts = product['name'].lower().split()
-        category = product['category'].replace('-', ' ')
+        name_parts = product.name.lower().split()
+        category = product.category.replace('-', ' ')
         
         # Create some realistic looking keywords
         keywords = [
@@ -113,12 +111,10 @@ def generate_mock_products(output_file="data/trending_products.csv"):
             f"{name_parts[0]} {name_parts[1]} review"
         ]
         
-        product_copy['keywords'] = ', '.join(keywords)
-        products_with_keywords.append(product_copy)
+        products_with_keywords.append(product.with_keywords(keywords))
     
     # Save products with keywords
-    keywords_df = pd.DataFrame(products_with_keywords)
-    keywords_df.to_csv(keywords_file, index=False)
+    write_products_csv(products_with_keywords, keywords_file)
     print(f"Generated mock keyword data for {len(products_with_keywords)} products")
     
     # Also create mock blog posts in case the content generation fails
@@ -126,26 +122,22 @@ def generate_mock_products(output_file="data/trending_products.csv"):
     blog_posts = []
     
     for product in products_with_keywords:
-        keywords = [k.strip() for k in product['keywords'].split(',')]
-        
-        blog_post = {
-            'title': f"Why the {product['name']} is a Game-Changer in {datetime.now().year}",
-            'content': generate_mock_blog_content(product['name'], product['category'], keywords),
-            'product_name': product['name'],
-            'product_price': product['price'],
-            'product_url': product['url'],
-            'product_image_url': product['image_url'],
-            'keywords': keywords,
-            'category': product['category'],
-            'date_created': datetime.now().strftime("%Y-%m-%d")
-        }
+        blog_post = BlogPost(
+            title=f"Why the {product.name} is a Game-Changer in {datetime.now().year}",
+            content=generate_mock_blog_content(product.name, product.category, product.keywords),
+            product_name=product.name,
+            product_price=product.price,
+            product_url=product.url,
+            product_image_url=product.image_url,
+            keywords=product.keywords,
+            category=product.category,
+            date_created=datetime.now().strftime("%Y-%m-%d")
+        )
         
         blog_posts.append(blog_post)
     
     # Save mock blog posts
-    os.makedirs(os.path.dirname(blog_posts_file), exist_ok=True)
-    with open(blog_posts_file, 'w') as f:
-        json.dump(blog_posts, f, indent=2)
+    write_posts_json(blog_posts, blog_posts_file)
     
     print(f"Generated {len(blog_posts)} mock blog posts")
     
@@ -0,0 +1,238 @@
+import os
+import json
+import math
+import logging
+import threading
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# USD per 1K tokens as (prompt, completion). Unknown models fall back to the
+# OPENAI_PROMPT_PRICE / OPENAI_COMPLETION_PRICE environment overrides.
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-4o": (0.0025, 0.01),
+}
+
+# English prose averages roughly 1.33 tokens per word and 4 characters per token.
+TOKENS_PER_WORD = 1.33
+CHARS_PER_TOKEN = 4
+# Each chat message carries a few tokens of role/formatting overhead.
+TOKENS_PER_MESSAGE = 4
+# JSON wrapping ({"id": n, "content": "..."}) per post in a batch response.
+TOKENS_PER_BATCH_ITEM = 12
+# Largest completion the chat models accept in one response.
+MAX_COMPLETION_TOKENS = 4096
+
+SYSTEM_MESSAGE = "You are a professional content writer specializing in SEO-friendly product reviews."
+
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+class PromptBuilder:
+    """Builds chat messages for a product and sizes max_tokens from the word count"""
+
+    def __init__(self, min_words=150, max_words=200, headroom=1.15):
+        self.min_words = min_words
+        self.max_words = max_words
+        self.headroom = headroom
+
+    def build_prompt(self, product, keywords):
+        product_name = product['name']
+        product_category = product['category'].replace('-', ' ')
+        product_price = product['price']
+        keywords_str = ', '.join(keywords)
+        return (
+            f"Write a concise, engaging {self.min_words}-{self.max_words} word blog post about the product \"{product_name}\" "
+            f"which is in the {product_category} category and priced at {product_price}. "
+            "The post should have an attention-grabbing introduction, "
+            "highlight key features and benefits, include a call to action, "
+            f"and naturally incorporate these keywords: {keywords_str}. "
+            "Format the response as a complete blog post with paragraphs."
+        )
+
+    def build_messages(self, product, keywords):
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": self.build_prompt(product, keywords)}
+        ]
+
+    def build_batch_prompt(self, items):
+        lines = [
+            f"Write a separate concise, engaging {self.min_words}-{self.max_words} word blog post for each product below. "
+            "Each post should have an attention-grabbing introduction, "
+            "highlight key features and benefits, include a call to action, "
+            "and naturally incorporate that product's keywords. "
+            "Separate paragraphs with blank lines.",
+            "",
+            "Respond with only a JSON object of the form "
+            '{"posts": [{"id": <product id>, "content": "<blog post>"}]}, '
+            "with exactly one entry per product id.",
+            ""
+        ]
+        for number, (product, keywords) in enumerate(items, start=1):
+            lines.append(
+                f"Product {number}: \"{product['name']}\" | category: {product['category'].replace('-', ' ')} "
+                f"| price: {product['price']} | keywords: {', '.join(keywords)}"
+            )
+        return "\n".join(lines)
+
+    def build_batch_messages(self, items):
+        return [
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": self.build_batch_prompt(items)}
+        ]
+
+    def parse_batch_response(self, text, count):
+        """Map 0-based item positions to post content; missing or malformed entries are left out"""
+        text = text.strip()
+        if text.startswith("```"):
+            text = text.strip("`")
+            if text.startswith("json"):
+                text = text[4:]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            logging.warning("Batch response was not valid JSON.")
+            return {}
+        posts = data.get("posts", []) if isinstance(data, dict) else data
+        parsed = {}
+        for entry in posts if isinstance(posts, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            try:
+                position = int(entry.get("id")) - 1
+            except (TypeError, ValueError):
+                continue
+            content = entry.get("content")
+            if 0 <= position < count and isinstance(content, str) and content.strip():
+                parsed[position] = content.strip()
+        return parsed
+
+    def max_tokens(self, count=1):
+        """Completion budget for `count` posts, with headroom so posts are not cut off"""
+        per_post = math.ceil(self.max_words * TOKENS_PER_WORD * self.headroom)
+        if count == 1:
+            return per_post
+        return min(MAX_COMPLETION_TOKENS, count * (per_post + TOKENS_PER_BATCH_ITEM))
+
+    def max_batch_size(self):
+        per_post = math.ceil(self.max_words * TOKENS_PER_WORD * self.headroom)
+        return max(1, MAX_COMPLETION_TOKENS // (per_post + TOKENS_PER_BATCH_ITEM))
+
+    def estimate_prompt_tokens(self, messages):
+        return sum(estimate_tokens(m['content']) + TOKENS_PER_MESSAGE for m in messages)
+
+
+class UsageTracker:
+    """Accumulates token usage, latency and cost per OpenAI call and enforces a run budget"""
+
+    def __init__(self, model, token_budget=None, cost_budget=None):
+        self.model = model
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        default_prompt, default_completion = MODEL_PRICES.get(model, (0.0, 0.0))
+        self.prompt_price = float(os.getenv("OPENAI_PROMPT_PRICE", default_prompt))
+        self.completion_price = float(os.getenv("OPENAI_COMPLETION_PRICE", default_completion))
+        self.calls = []
+        self.fallbacks = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_cost = 0.0
+        # The server streams previews from several Flask threads into one tracker
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model):
+        token_budget = os.getenv("OPENAI_TOKEN_BUDGET")
+        cost_budget = os.getenv("OPENAI_COST_BUDGET")
+        return cls(
+            model,
+            token_budget=int(token_budget) if token_budget else None,
+            cost_budget=float(cost_budget) if cost_budget else None
+        )
+
+    def cost(self, prompt_tokens, completion_tokens):
+        return (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1000
+
+    @property
+    def total_tokens(self):
+        return self.prompt_tokens + self.completion_tokens
+
+    def would_exceed_budget(self, estimated_prompt_tokens=0, max_completion_tokens=0):
+        """True if a call of the given (worst-case) size would push the run over budget"""
+        if self.token_budget is not None:
+            if self.total_tokens + estimated_prompt_tokens + max_completion_tokens > self.token_budget:
+                return True
+        if self.cost_budget is not None:
+            if self.total_cost + self.cost(estimated_prompt_tokens, max_completion_tokens) > self.cost_budget:
+                return True
+        return False
+
+    def record(self, label, usage, latency, first_token_latency=None):
+        prompt_tokens = usage.get('prompt_tokens', 0)
+        completion_tokens = usage.get('completion_tokens', 0)
+        call = {
+            'label': label,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'latency': latency,
+            'cost': self.cost(prompt_tokens, completion_tokens)
+        }
+        if first_token_latency is not None:
+            call['first_token_latency'] = first_token_latency
+        with self.lock:
+            self.calls.append(call)
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.total_cost += call['cost']
+        return call
+
+    def record_fallback(self):
+        with self.lock:
+            self.fallbacks += 1
+
+    def report(self):
+        with self.lock:
+            calls = list(self.calls)
+        latencies = sorted(c['latency'] for c in calls)
+        first_token_latencies = sorted(c['first_token_latency'] for c in calls if 'first_token_latency' in c)
+
+        def percentile(p, values=latencies):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+        return {
+            'model': self.model,
+            'calls': len(calls),
+            'fallbacks': self.fallbacks,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'total_cost_usd': round(self.total_cost, 6),
+            'latency_total_s': round(sum(latencies), 3),
+            'latency_p50_s': round(percentile(50), 3),
+            'latency_p95_s': round(percentile(95), 3),
+            'first_token_p50_s': round(percentile(50, first_token_latencies), 3),
+            'token_budget': self.token_budget,
+            'cost_budget_usd': self.cost_budget,
+            'per_call': calls
+        }
+
+    def save_report(self, output_file="data/generation_report.json"):
+        report = self.report()
+        if os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        logging.info(
+            f"OpenAI usage: {report['calls']} calls, {report['total_tokens']} tokens, "
+            f"${report['total_cost_usd']:.4f}, p50 {report['latency_p50_s']}s, "
+            f"p95 {report['latency_p95_s']}s, {report['fallbacks']} fallbacks. Report saved to {output_file}"
+        )
+        return report
+
@@ -0,0 +1,146 @@
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+
+class CircuitBreaker:
+    """Stops calls to a provider after repeated failures until a cool-down window has passed"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=3, cooldown=60.0, max_cooldown=600.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may go out now; after the cool-down exactly one trial call is let through"""
+        with self.lock:
+            if self.state == self.OPEN and self.clock() >= self.open_until:
+                self.state = self.HALF_OPEN
+                self.trial_in_flight = False
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                # The trial call failed: stay away for longer this time.
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.open_until = self.clock() + self.cooldown
+            self.trial_in_flight = False
+
+
+class ProviderRouter:
+    """Calls interchangeable providers in order, skipping ones whose circuit is open.
+
+    With hedge_after set, a provider that has not answered within that many seconds is
+    raced against the next one and the first acceptable answer wins.
+    """
+
+    def __init__(self, providers, hedge_after=None, failure_threshold=3, cooldown=60.0):
+        self.providers = [name for name, _ in providers]
+        self.functions = dict(providers)
+        self.hedge_after = hedge_after
+        self.breakers = {name: CircuitBreaker(failure_threshold, cooldown) for name in self.providers}
+        self.counters = {name: {'calls': 0, 'failures': 0, 'skipped': 0, 'hedged': 0, 'latency': 0.0} for name in self.providers}
+        self.lock = threading.Lock()
+        # Calls run on worker threads so a hedge can start while the first call is still waiting.
+        self.executor = ThreadPoolExecutor(max_workers=max(1, 2 * len(self.providers)), thread_name_prefix="provider")
+
+    def _count(self, name, key, amount=1):
+        with self.lock:
+            self.counters[name][key] += amount
+
+    def _invoke(self, name, *args):
+        """Run one provider call and feed the outcome to its breaker; returns None on failure"""
+        start = time.monotonic()
+        try:
+            result = self.functions[name](*args)
+        except Exception as e:
+            self.breakers[name].record_failure()
+            self._count(name, 'failures')
+            logging.warning(f"Provider {name} failed after {time.monotonic() - start:.2f}s: {e}")
+            return None
+        finally:
+            self._count(name, 'calls')
+            self._count(name, 'latency', time.monotonic() - start)
+        self.breakers[name].record_success()
+        return result
+
+    def call(self, *args, accept=bool):
+        """First result `accept` approves, else the best non-failing result (by length), else None"""
+        remaining = iter(self.providers)
+        pending = {}
+        best = None
+
+        def launch(hedge=False):
+            for name in remaining:
+                if not self.breakers[name].allow():
+                    self._count(name, 'skipped')
+                    continue
+                if hedge:
+                    self._count(name, 'hedged')
+                pending[self.executor.submit(self._invoke, name, *args)] = name
+                return True
+            return False
+
+        launch()
+        while pending:
+            done, _ = wait(pending, timeout=self.hedge_after, return_when=FIRST_COMPLETED)
+            if not done:
+                # The in-flight provider is slow: race the next healthy one against it.
+                launch(hedge=True)
+                continue
+            for future in done:
+                del pending[future]
+                result = future.result()
+                if result is None:
+                    continue
+                if accept(result):
+                    # Calls still in flight finish in the background and still update their breakers.
+                    return result
+                if best is None or len(result) > len(best):
+                    best = result
+            if not pending:
+                launch()
+        return best
+
+    def stats(self):
+        with self.lock:
+            return {
+                name: dict(
+                    counters,
+                    latency=round(counters['latency'], 3),
+                    state=self.breakers[name].state,
+                    avg_latency_s=round(counters['latency'] / counters['calls'], 3) if counters['calls'] else 0.0
+                )
+                for name, counters in self.counters.items()
+            }
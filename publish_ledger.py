@@ -0,0 +1,88 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from dotenv import load_dotenv
+from dedup import normalize_name
+
+load_dotenv()
+
+LEDGER_DB = os.getenv("PUBLISH_LEDGER_DB", "data/publish_ledger.db")
+
+# Fields that change what readers see; anything else (e.g. date_created) does not
+# make a post "changed" and so does not trigger a re-publish.
+CONTENT_FIELDS = ['title', 'content', 'product_name', 'product_price', 'product_url', 'product_image_url', 'keywords', 'category', 'related', 'images']
+
+
+def post_id(post):
+    """Stable ID for a post, derived from its product rather than its (randomly templated) title"""
+    key = f"{post.get('category', '')}:{normalize_name(post.get('product_name', post.get('title', '')))}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def content_hash(post):
+    payload = json.dumps({field: post.get(field) for field in CONTENT_FIELDS}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class PublishLedger:
+    """Records what has been published where, so unchanged posts are skipped and changed ones edited"""
+
+    def __init__(self, db_path=LEDGER_DB):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS published (
+                post_id TEXT NOT NULL,
+                target TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                remote_id TEXT,
+                remote_url TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (post_id, target)
+            )
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_published_remote ON published (target, remote_id)")
+        self.conn.commit()
+
+    def get(self, post_id, target):
+        row = self.conn.execute(
+            "SELECT content_hash, remote_id, remote_url FROM published WHERE post_id = ? AND target = ?",
+            (post_id, target)
+        ).fetchone()
+        if row is None:
+            return None
+        return {'content_hash': row[0], 'remote_id': row[1], 'remote_url': row[2]}
+
+    def owner(self, target, remote_id):
+        """post_id that owns remote_id on a target, or None"""
+        row = self.conn.execute(
+            "SELECT post_id FROM published WHERE target = ? AND remote_id = ?", (target, remote_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def check(self, post, target):
+        """Return (action, entry) where action is 'skip', 'update' or 'create'"""
+        entry = self.get(post_id(post), target)
+        if entry is None:
+            return 'create', None
+        if entry['content_hash'] == content_hash(post):
+            return 'skip', entry
+        return 'update', entry
+
+    def record(self, post, target, remote_id, remote_url):
+        self.conn.execute("""
+            INSERT INTO published (post_id, target, content_hash, remote_id, remote_url, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (post_id, target) DO UPDATE SET
+                content_hash = excluded.content_hash, remote_id = excluded.remote_id,
+                remote_url = excluded.remote_url, updated_at = excluded.updated_at
+        """, (post_id(post), target, content_hash(post), str(remote_id) if remote_id is not None else None, remote_url, time.time()))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -6,10 +6,14 @@ from datetime import datetime
 import markdown
 import html
 from dotenv import load_dotenv
+from publish_ledger import PublishLedger, post_id
+from search_index import SearchIndex
+from image_pipeline import IMAGE_CACHE_DIR, IMAGE_BASE_URL, picture_html
 
 try:
     from wordpress_xmlrpc import Client, WordPressPost
-    from wordpress_xmlrpc.methods.posts import NewPost
+    from wordpress_xmlrpc.compat import xmlrpc_client
+    from wordpress_xmlrpc.methods.posts import NewPost, EditPost
     WP_AVAILABLE = True
 except ImportError:
     WP_AVAILABLE = False
@@ -18,67 +22,176 @@ except ImportError:
 load_dotenv()
 
 class BlogPublisher:
-    def __init__(self):
+    def __init__(self, ledger=None, search_index=None):
         self.wp_url = os.getenv("WORDPRESS_URL")
         self.wp_username = os.getenv("WORDPRESS_USERNAME")
         self.wp_password = os.getenv("WORDPRESS_PASSWORD")
         
         self.medium_token = os.getenv("MEDIUM_TOKEN")
         
+        self.wp_multicall_chunk_size = int(os.getenv("WORDPRESS_MULTICALL_CHUNK_SIZE", "50"))
+        self._wp_client = None
+        
+        # Ledger of what was already published where, keyed on a stable post ID
+        self.ledger = ledger or PublishLedger()
+        # Search index over the HTML posts, updated as each post is saved
+        self.search_index = search_index or SearchIndex()
+        
         self.can_use_wordpress = all([self.wp_url, self.wp_username, self.wp_password]) and WP_AVAILABLE
         self.can_use_medium = bool(self.medium_token)
         
         if not self.can_use_wordpress and not self.can_use_medium:
             print("Warning: No publishing credentials found. Will save posts as HTML files instead.")
     
-    def publish_to_wordpress(self, post):
-        """Publish a blog post to WordPress"""
-        if not self.can_use_wordpress:
-            print("WordPress credentials not found or module not installed.")
-            return None
-            
-        try:
-            client = Client(
+    def get_wordpress_client(self):
+        """Return the shared WordPress client, connecting on first use"""
+        # One client per publisher: the XML-RPC transport keeps its HTTP connection
+        # alive and the supported-methods handshake is only done once.
+        if self._wp_client is None:
+            self._wp_client = Client(
                 f"{self.wp_url}/xmlrpc.php",
                 self.wp_username,
                 self.wp_password
             )
+        return self._wp_client
+    
+    def remote_image_html(self, post):
+        """Image markup for WordPress/Medium: cached thumbnails when IMAGE_BASE_URL is set, else the retailer URL"""
+        if post.get('images') and IMAGE_BASE_URL:
+            return picture_html(post['images'], IMAGE_BASE_URL.rstrip('/'), post['product_name'])
+        if post.get('product_image_url'):
+            return f"<img src='{post['product_image_url']}' alt='{post['product_name']}' loading='lazy'/>"
+        return ''
+    
+    def build_wordpress_post(self, post):
+        wp_post = WordPressPost()
+        wp_post.title = post['title']
+        
+        content = post['content']
+        image = self.remote_image_html(post)
+        if image:
+            content = f"{image}\n\n" + content
             
-            wp_post = WordPressPost()
-            wp_post.title = post['title']
-            
-            content = post['content']
-            if post.get('product_image_url'):
-                content = f"<img src='{post['product_image_url']}' alt='{post['product_name']}'/>\n\n" + content
-                
-            if post.get('product_url'):
-                content += f"\n\n<p><a href='{post['product_url']}' target='_blank'>Check out the product here</a></p>"
-                
-            wp_post.content = content
+        if post.get('product_url'):
+            content += f"\n\n<p><a href='{post['product_url']}' target='_blank'>Check out the product here</a></p>"
             
-            wp_post.terms_names = {
-                'post_tag': post.get('keywords', []),
-                'category': [post.get('category', 'Products').replace('-', ' ').title()]
-            }
+        wp_post.content = content
+        
+        wp_post.terms_names = {
+            'post_tag': post.get('keywords', []),
+            'category': [post.get('category', 'Products').replace('-', ' ').title()]
+        }
+        
+        wp_post.post_status = 'publish'
+        return wp_post
+    
+    def publish_to_wordpress(self, post):
+        """Publish a blog post to WordPress"""
+        if not self.can_use_wordpress:
+            print("WordPress credentials not found or module not installed.")
+            return None
             
-            wp_post.post_status = 'publish'
+        action, entry = self.ledger.check(post, 'wordpress')
+        if action == 'skip':
+            print(f"Unchanged, already on WordPress: {entry['remote_url']}")
+            return entry['remote_url']
             
-            post_id = client.call(NewPost(wp_post))
-            post_url = f"{self.wp_url}/?p={post_id}"
+        try:
+            client = self.get_wordpress_client()
+            wp_post = self.build_wordpress_post(post)
+            if action == 'update':
+                remote_id = entry['remote_id']
+                client.call(EditPost(remote_id, wp_post))
+            else:
+                remote_id = client.call(NewPost(wp_post))
+            post_url = f"{self.wp_url}/?p={remote_id}"
+            self.ledger.record(post, 'wordpress', remote_id, post_url)
             
-            print(f"Published to WordPress: {post_url}")
+            print(f"{'Updated' if action == 'update' else 'Published'} on WordPress: {post_url}")
             return post_url
             
         except Exception as e:
             print(f"Error publishing to WordPress: {str(e)}")
             return None
     
+    def publish_many_to_wordpress(self, posts, chunk_size=None):
+        """Publish posts to WordPress in chunks, one system.multicall round trip per chunk.
+
+        Posts the ledger marks unchanged are skipped and changed ones are edited in place.
+        Returns one result dict per post with 'title', 'url', 'action' and 'error' (None on success).
+        Falls back to one call per post if the server does not offer system.multicall.
+        """
+        if not self.can_use_wordpress:
+            print("WordPress credentials not found or module not installed.")
+            return [{'title': post['title'], 'url': None, 'action': None, 'error': "WordPress not configured"} for post in posts]
+        
+        chunk_size = chunk_size or self.wp_multicall_chunk_size
+        try:
+            client = self.get_wordpress_client()
+        except Exception as e:
+            print(f"Error connecting to WordPress: {str(e)}")
+            return [{'title': post['title'], 'url': None, 'action': None, 'error': str(e)} for post in posts]
+        
+        results = {}
+        pending = []
+        for index, post in enumerate(posts):
+            action, entry = self.ledger.check(post, 'wordpress')
+            if action == 'skip':
+                results[index] = {'title': post['title'], 'url': entry['remote_url'], 'action': 'skip', 'error': None}
+            else:
+                pending.append((index, post, action, entry))
+        
+        if pending and 'system.multicall' not in client.supported_methods:
+            for index, post, action, entry in pending:
+                url = self.publish_to_wordpress(post)
+                results[index] = {'title': post['title'], 'url': url, 'action': action, 'error': None if url else "publish failed"}
+            pending = []
+        
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            multicall = xmlrpc_client.MultiCall(client.server)
+            for index, post, action, entry in chunk:
+                wp_post = self.build_wordpress_post(post)
+                method = EditPost(entry['remote_id'], wp_post) if action == 'update' else NewPost(wp_post)
+                getattr(multicall, method.method_name)(*method.get_args(client))
+            try:
+                responses = multicall()
+            except Exception as e:
+                print(f"Error publishing chunk of {len(chunk)} posts to WordPress: {str(e)}")
+                for index, post, action, entry in chunk:
+                    results[index] = {'title': post['title'], 'url': None, 'action': action, 'error': str(e)}
+                continue
+            for position, (index, post, action, entry) in enumerate(chunk):
+                try:
+                    response = responses[position]
+                    remote_id = entry['remote_id'] if action == 'update' else response
+                    post_url = f"{self.wp_url}/?p={remote_id}"
+                    self.ledger.record(post, 'wordpress', remote_id, post_url)
+                    results[index] = {'title': post['title'], 'url': post_url, 'action': action, 'error': None}
+                except Exception as e:
+                    results[index] = {'title': post['title'], 'url': None, 'action': action, 'error': str(e)}
+        
+        results = [results[index] for index in range(len(posts))]
+        counts = {action: sum(1 for r in results if r['action'] == action and r['error'] is None) for action in ('create', 'update', 'skip')}
+        failed = sum(1 for r in results if r['error'] is not None)
+        print(f"WordPress: {counts['create']} published, {counts['update']} updated, {counts['skip']} unchanged, {failed} failed.")
+        return results
+    
     def publish_to_medium(self, post):
         """Publish a blog post to Medium"""
         if not self.can_use_medium:
             print("Medium token not found.")
             return None
             
+        action, entry = self.ledger.check(post, 'medium')
+        if action == 'skip':
+            print(f"Unchanged, already on Medium: {entry['remote_url']}")
+            return entry['remote_url']
+        if action == 'update':
+            # Medium's API can create posts but not edit them; publishing again would duplicate it.
+            print(f"Post changed but Medium does not support editing, keeping: {entry['remote_url']}")
+            return entry['remote_url']
+            
         try:
             url = "https://api.medium.com/v1/users/me/posts"
             
@@ -91,8 +204,9 @@ class BlogPublisher:
             if not content.startswith("<"):
                 content = markdown.markdown(content)
                 
-            if post.get('product_image_url'):
-                content = f"<img src='{post['product_image_url']}' alt='{post['product_name']}'/>\n\n" + content
+            image = self.remote_image_html(post)
+            if image:
+                content = f"{image}\n\n" + content
                 
             if post.get('product_url'):
                 content += f"\n\n<p><a href='{post['product_url']}' target='_blank'>Check out the product here</a></p>"
@@ -110,6 +224,7 @@ class BlogPublisher:
             data = response.json()
             
             post_url = data.get("data", {}).get("url", "")
+            self.ledger.record(post, 'medium', data.get("data", {}).get("id"), post_url)
             print(f"Published to Medium: {post_url}")
             return post_url
             
@@ -117,13 +232,48 @@ class BlogPublisher:
             print(f"Error publishing to Medium: {str(e)}")
             return None
     
+    def html_filename(self, post, output_dir):
+        """Title-based filename, suffixed with the post ID if another post or an unrecorded file already has it"""
+        safe_title = "".join([c if c.isalnum() else "_" for c in post['title']])
+        filename = f"{output_dir}/{safe_title}.html"
+        owner = self.ledger.owner('html', filename)
+        if owner != post_id(post) and (owner is not None or os.path.exists(filename)):
+            filename = f"{output_dir}/{safe_title}_{post_id(post)}.html"
+        return filename
+    
+    def local_image_html(self, post, output_dir):
+        """Image markup for an HTML page, linking the local image cache relative to the page"""
+        if post.get('images'):
+            base_url = os.path.relpath(IMAGE_CACHE_DIR, output_dir).replace(os.sep, '/')
+            return picture_html(post['images'], base_url, post['product_name'])
+        if post.get('product_image_url'):
+            return f'<img src="{post["product_image_url"]}" alt="{post["product_name"]}" loading="lazy">'
+        return ''
+    
+    def related_links_html(self, post):
+        """Internal links block for post['related'], limited to posts that already have an HTML page"""
+        links = []
+        for item in post.get('related') or []:
+            entry = self.ledger.get(item['post_id'], 'html')
+            if entry and entry['remote_id']:
+                links.append(f'<li><a href="{os.path.basename(entry["remote_id"])}">{html.escape(item["title"])}</a></li>')
+        if not links:
+            return ''
+        return f'<aside class="related-posts"><h2>Related posts</h2><ul>{"".join(links)}</ul></aside>'
+    
     def save_as_html(self, post, output_dir="output/html"):
         """Save blog post as an HTML file"""
         try:
             os.makedirs(output_dir, exist_ok=True)
             
-            safe_title = "".join([c if c.isalnum() else "_" for c in post['title']])
-            filename = f"{output_dir}/{safe_title}.html"
+            action, entry = self.ledger.check(post, 'html')
+            if entry and os.path.dirname(entry['remote_id']) == output_dir and os.path.exists(entry['remote_id']):
+                if action == 'skip':
+                    print(f"Unchanged, skipping HTML: {entry['remote_id']}")
+                    return entry['remote_id']
+                filename = entry['remote_id']
+            else:
+                filename = self.html_filename(post, output_dir)
             
             content = post['content']
             if not content.startswith("<"):
@@ -177,6 +327,10 @@ class BlogPublisher:
                     .cta:hover {{
                         background-color: #0069d9;
                     }}
+                    .related-posts {{
+                        border-top: 1px solid #eee;
+                        margin-top: 30px;
+                    }}
                 </style>
             </head>
             <body>
@@ -190,7 +344,7 @@ class BlogPublisher:
                         <p class="keywords"><strong>Keywords:</strong> {', '.join(post.get('keywords', []))}</p>
                     </div>
                     
-                    {f'<img src="{post["product_image_url"]}" alt="{post["product_name"]}">' if post.get('product_image_url') else ''}
+                    {self.local_image_html(post, output_dir)}
                     
                     <div class="content">
                         {content}
@@ -198,6 +352,8 @@ class BlogPublisher:
                     
                     {f'<a href="{post["product_url"]}" class="cta" target="_blank">Check out this product</a>' if post.get('product_url') else ''}
                     
+                    {self.related_links_html(post)}
+                    
                     <footer>
                         <p>Published on {post.get('date_created', datetime.now().strftime("%Y-%m-%d"))}</p>
                     </footer>
@@ -209,6 +365,8 @@ class BlogPublisher:
             # Save the HTML file
             with open(filename, 'w', encoding='utf-8') as f:
                 f.write(html_content)
+            self.ledger.record(post, 'html', filename, filename)
+            self.search_index.add_post(post, f"/post/{os.path.basename(filename)}")
                 
             print(f"Saved blog post as HTML: {filename}")
             return filename
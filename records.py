@@ -0,0 +1,240 @@
+import os
+import csv
+import json
+import math
+import time
+import random
+import logging
+import argparse
+import tempfile
+import tracemalloc
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+# Blank placeholders the scraper used for missing URLs, and pandas' NaN written back as text.
+PLACEHOLDERS = {"", "nan"}
+
+
+class RecordValidationError(ValueError):
+    pass
+
+
+def clean_text(value):
+    """str(value).strip(), with None, NaN and scraper placeholders mapped to ''"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    text = str(value).strip()
+    return "" if text in PLACEHOLDERS else text
+
+
+def split_keywords(value):
+    """Keywords as a list, whether stored as a list or as a comma-separated string"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return []
+    if isinstance(value, str):
+        return [k.strip() for k in value.split(',') if k.strip()]
+    return [str(k).strip() for k in value if str(k).strip()]
+
+
+class RecordMixin:
+    """Dict-style access, so code written against the old dict records keeps working"""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key not in self.FIELD_NAMES:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELD_NAMES:
+            raise KeyError(f"{type(self).__name__} has no field {key!r}")
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELD_NAMES and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.FIELD_NAMES else None
+        return default if value is None else value
+
+    def to_dict(self):
+        """Plain dict for JSON; optional fields that are unset are left out"""
+        return {name: getattr(self, name) for name in self.FIELD_NAMES if getattr(self, name) is not None}
+
+
+@dataclass(slots=True)
+class Product(RecordMixin):
+    name: str
+    price: str
+    category: str
+    rating: str = ""
+    url: str = ""
+    image_url: str = ""
+    keywords: list = field(default_factory=list)
+
+    CSV_FIELDS = ("name", "price", "rating", "url", "image_url", "category")
+
+    @classmethod
+    def from_dict(cls, data, validate=True):
+        product = cls(
+            name=clean_text(data.get('name')),
+            price=clean_text(data.get('price')),
+            category=clean_text(data.get('category')),
+            rating=clean_text(data.get('rating')),
+            url=clean_text(data.get('url')),
+            image_url=clean_text(data.get('image_url')),
+            keywords=split_keywords(data.get('keywords'))
+        )
+        if validate:
+            product.validate()
+        return product
+
+    @classmethod
+    def coerce(cls, product):
+        return product if isinstance(product, cls) else cls.from_dict(product, validate=False)
+
+    def validate(self):
+        if not self.name:
+            raise RecordValidationError("Product has no name")
+        if not self.category:
+            raise RecordValidationError(f"Product '{self.name}' has no category")
+        for name in ("url", "image_url"):
+            value = getattr(self, name)
+            if value and not value.startswith(("http://", "https://")):
+                raise RecordValidationError(f"Product '{self.name}' has an invalid {name}: {value!r}")
+        return self
+
+    def with_keywords(self, keywords):
+        return replace(self, keywords=list(keywords))
+
+
+@dataclass(slots=True)
+class BlogPost(RecordMixin):
+    title: str
+    content: str
+    product_name: str
+    category: str
+    product_price: str = ""
+    product_url: str = ""
+    product_image_url: str = ""
+    keywords: list = field(default_factory=list)
+    date_created: str = ""
+    duplicate_of: Optional[str] = None
+    related: Optional[list] = None
+    images: Optional[dict] = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.FIELD_NAMES if name in data})
+
+
+Product.FIELD_NAMES = tuple(f.name for f in fields(Product))
+BlogPost.FIELD_NAMES = tuple(f.name for f in fields(BlogPost))
+
+
+def read_products_csv(path):
+    """Products straight from CSV rows, with no DataFrame in between"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [Product.from_dict(row, validate=False) for row in csv.DictReader(f) if row.get('name')]
+
+
+def write_products_csv(products, path):
+    """Write products in the existing CSV layout; a keywords column is added when any product has keywords"""
+    products = [Product.coerce(p) for p in products]
+    columns = list(Product.CSV_FIELDS)
+    with_keywords = any(p.keywords for p in products)
+    if with_keywords:
+        columns.append("keywords")
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for p in products:
+            row = [p.name, p.price, p.rating, p.url, p.image_url, p.category]
+            if with_keywords:
+                row.append(", ".join(p.keywords))
+            writer.writerow(row)
+    return len(products)
+
+
+def read_posts_json(path):
+    with open(path, encoding='utf-8') as f:
+        return [BlogPost.from_dict(p) for p in json.load(f)]
+
+
+def write_posts_json(posts, path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([p.to_dict() if isinstance(p, BlogPost) else p for p in posts], f, indent=2)
+
+
+def run_benchmark(num_products=100000):
+    """Memory per product and CSV round-trip time: dict + DataFrame path vs Product records"""
+    import pandas as pd
+
+    rng = random.Random(3)
+    categories = ["electronics", "home-kitchen", "fashion", "toys-games", "beauty"]
+    rows = [
+        {
+            'name': f"Product {i} with {rng.choice(['Noise Cancellation', 'Smart Control', 'Extra Storage'])}",
+            'price': f"${rng.uniform(5, 500):.2f}",
+            'rating': f"{rng.uniform(3, 5):.1f} out of 5 stars",
+            'url': f"https://www.amazon.com/dp/B{i:09d}",
+            'image_url': f"https://images.example.com/{i}.jpg",
+            'category': rng.choice(categories),
+            'keywords': f"best product {i}, product {i} review, affordable product {i}"
+        }
+        for i in range(num_products)
+    ]
+
+    def measure(load):
+        # Timed without tracemalloc, which slows allocation-heavy code several times over.
+        start = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        loaded = load()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return loaded, elapsed, retained
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_file = os.path.join(tmp, "legacy.csv")
+        records_file = os.path.join(tmp, "records.csv")
+
+        # Current path: DataFrame to and from CSV, dict records, keywords re-split per post.
+        start = time.perf_counter()
+        pd.DataFrame(rows).to_csv(legacy_file, index=False)
+        legacy_write = time.perf_counter() - start
+
+        def load_legacy():
+            products = pd.read_csv(legacy_file).to_dict(orient='records')
+            for product in products:
+                product['keywords_list'] = [k.strip() for k in product.get('keywords', '').split(',') if k.strip()]
+            return products
+        legacy, legacy_read, legacy_bytes = measure(load_legacy)
+        del legacy
+
+        records = [Product.from_dict(r, validate=False) for r in rows]
+        start = time.perf_counter()
+        write_products_csv(records, records_file)
+        records_write = time.perf_counter() - start
+        del records
+        loaded, records_read, records_bytes = measure(lambda: read_products_csv(records_file))
+        del loaded
+
+    print(f"{num_products} products")
+    print(f"  dict + DataFrame: {legacy_bytes / num_products:7.0f} bytes/product, write {legacy_write:.2f}s, read {legacy_read:.2f}s")
+    print(f"  Product records:  {records_bytes / num_products:7.0f} bytes/product, write {records_write:.2f}s, read {records_read:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Product records against the dict + DataFrame path")
+    parser.add_argument("--benchmark", type=int, metavar="N", default=100000)
+    args = parser.parse_args()
+    run_benchmark(args.benchmark)
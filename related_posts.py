@@ -0,0 +1,266 @@
+import os
+import json
+import math
+import time
+import random
+import logging
+import argparse
+from collections import Counter
+import numpy as np
+from dotenv import load_dotenv
+from publish_ledger import post_id
+from records import read_posts_json
+from search_index import tokenize
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+RELATED_FILE = os.getenv("RELATED_POSTS_FILE", "data/related_posts.json")
+# Added to the cosine score of posts in the same category.
+CATEGORY_BOOST = 0.1
+# Features shared by more than this many posts (e.g. "best", "review") carry almost no
+# signal but dominate the cost, so they are left out of the vectors. A fixed cap keeps
+# each post's candidate fan-out bounded, so a full build grows linearly with the catalog.
+MAX_DF = int(os.getenv("RELATED_MAX_DF", "100"))
+# Rows scored per numpy block; bounds memory at roughly block size x candidates.
+BLOCK_SIZE = 512
+
+
+def post_features(post):
+    """Sparse feature counts: whole keyword phrases plus tokens from keywords and product name"""
+    keywords = post.get('keywords', [])
+    if isinstance(keywords, str):
+        keywords = [k.strip() for k in keywords.split(',') if k.strip()]
+    features = Counter()
+    for keyword in keywords:
+        features[f"kw:{keyword.lower()}"] += 1
+        features.update(f"tok:{t}" for t in tokenize(keyword))
+    features.update(f"tok:{t}" for t in tokenize(post.get('product_name', '')))
+    return features
+
+
+class RelatedPosts:
+    """Top-k related posts per post from TF-IDF cosine similarity over keyword features"""
+
+    def __init__(self, path=RELATED_FILE, top_k=5):
+        self.path = path
+        self.top_k = top_k
+        self.posts = {}
+        self.related = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            self.posts = data.get('posts', {})
+            self.related = data.get('related', {})
+
+    def save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'posts': self.posts, 'related': self.related}, f)
+
+    def _matrix(self):
+        """Build row-normalized TF-IDF vectors in CSR form plus the feature -> rows postings"""
+        ids = list(self.posts)
+        row_features = [Counter(self.posts[pid]['features']) for pid in ids]
+        df = Counter()
+        for features in row_features:
+            df.update(features.keys())
+        n = len(ids)
+        vocab = {f: i for i, f in enumerate(f for f, count in df.items() if 1 < count <= MAX_DF)}
+        idf = np.zeros(len(vocab))
+        for feature, index in vocab.items():
+            idf[index] = math.log(n / df[feature])
+
+        indptr = [0]
+        indices, values = [], []
+        for features in row_features:
+            kept = [(vocab[f], tf) for f, tf in features.items() if f in vocab]
+            indices.extend(i for i, _ in kept)
+            values.extend(tf for _, tf in kept)
+            indptr.append(len(indices))
+        indptr = np.array(indptr, dtype=np.int64)
+        indices = np.array(indices, dtype=np.int64)
+        values = np.array(values, dtype=np.float64) * idf[indices] if len(indices) else np.zeros(0)
+        row_of = np.repeat(np.arange(n), np.diff(indptr))
+        norms = np.sqrt(np.bincount(row_of, weights=values ** 2, minlength=n))
+        values = values / np.where(norms[row_of] > 0, norms[row_of], 1)
+
+        # Transpose (CSC): for every feature, the rows that contain it.
+        order = np.argsort(indices, kind='stable')
+        col_rows = row_of[order]
+        col_values = values[order]
+        col_ptr = np.concatenate([[0], np.cumsum(np.bincount(indices, minlength=len(vocab)))])
+
+        categories = {c: i for i, c in enumerate(sorted({self.posts[pid].get('category') or '' for pid in ids}))}
+        category_codes = np.array([categories[self.posts[pid].get('category') or ''] for pid in ids], dtype=np.int64)
+        return ids, indptr, indices, values, col_ptr, col_rows, col_values, category_codes
+
+    def _top_k_for_rows(self, rows, matrix):
+        """Score `rows` against every post sharing a feature with them; returns {row: [(row, score)]}"""
+        ids, indptr, indices, values, col_ptr, col_rows, col_values, category_codes = matrix
+        n = len(ids)
+        result = {}
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block = np.asarray(rows[start:start + BLOCK_SIZE], dtype=np.int64)
+            # Every (row, feature) entry of the block...
+            lengths = indptr[block + 1] - indptr[block]
+            entry_rows = np.repeat(block, lengths)
+            entry_pos = np.concatenate([np.arange(indptr[r], indptr[r + 1]) for r in block]) if len(block) else np.zeros(0, dtype=np.int64)
+            entry_features = indices[entry_pos]
+            entry_values = values[entry_pos]
+            # ...expanded to every other row containing that feature.
+            fan_out = col_ptr[entry_features + 1] - col_ptr[entry_features]
+            total = int(fan_out.sum())
+            if total == 0:
+                continue
+            offsets = np.arange(total) - np.repeat(np.cumsum(fan_out) - fan_out, fan_out)
+            positions = np.repeat(col_ptr[entry_features], fan_out) + offsets
+            pair_rows = np.repeat(entry_rows, fan_out)
+            pair_cols = col_rows[positions]
+            pair_values = np.repeat(entry_values, fan_out) * col_values[positions]
+            keep = pair_rows != pair_cols
+            keys, inverse = np.unique(pair_rows[keep] * n + pair_cols[keep], return_inverse=True)
+            scores = np.bincount(inverse, weights=pair_values[keep])
+            a, b = keys // n, keys % n
+            scores += CATEGORY_BOOST * (category_codes[a] == category_codes[b])
+            # Sort by row, then by descending score, and keep the first top_k of each row.
+            order = np.lexsort((-scores, a))
+            a, b, scores = a[order], b[order], scores[order]
+            first = np.concatenate([[0], np.flatnonzero(np.diff(a)) + 1])
+            rank = np.arange(len(a)) - np.repeat(first, np.diff(np.concatenate([first, [len(a)]])))
+            top = rank < self.top_k
+            for row, col, score in zip(a[top].tolist(), b[top].tolist(), scores[top].tolist()):
+                result.setdefault(row, []).append((col, score))
+        return result
+
+    def rebuild(self):
+        """Recompute related posts for the whole catalog"""
+        start = time.perf_counter()
+        matrix = self._matrix()
+        ids = matrix[0]
+        top = self._top_k_for_rows(list(range(len(ids))), matrix)
+        self.related = {
+            ids[row]: [[ids[col], round(score, 4)] for col, score in top.get(row, [])]
+            for row in range(len(ids))
+        }
+        logging.info(f"Computed related posts for {len(ids)} posts in {time.perf_counter() - start:.2f}s")
+        return self.related
+
+    def _neighbours(self):
+        return {pid: [pair[0] for pair in neighbours] for pid, neighbours in self.related.items()}
+
+    def add_posts(self, posts):
+        """Add or update posts and refresh only the affected related lists.
+
+        Returns the IDs of every post whose rendered related list may differ: the changed
+        posts, posts that list one of them (its title may have changed) and posts whose
+        list gained or lost an entry.
+        """
+        changed = []
+        for post in posts:
+            pid = post_id(post)
+            entry = {
+                'title': post['title'],
+                'category': post.get('category'),
+                'features': dict(post_features(post))
+            }
+            if self.posts.get(pid) != entry:
+                changed.append(pid)
+            self.posts[pid] = entry
+        if not changed:
+            return set()
+        changed_set = set(changed)
+        listing = {pid for pid, neighbours in self.related.items() if any(pair[0] in changed_set for pair in neighbours)}
+        if len(changed) > len(self.posts) // 2:
+            return self._rebuild_changed(changed_set | listing)
+
+        matrix = self._matrix()
+        ids = matrix[0]
+        row_of = {pid: row for row, pid in enumerate(ids)}
+        # Posts that listed a changed post lose that entry, so their lists are recomputed
+        # too rather than left short.
+        stale = [pid for pid in listing if pid not in changed_set and pid in row_of]
+        recomputed = changed + stale
+        if len(recomputed) > len(self.posts) // 2:
+            return self._rebuild_changed(changed_set | listing)
+        top = self._top_k_for_rows([row_of[pid] for pid in recomputed], matrix)
+        for pid in recomputed:
+            self.related[pid] = [[ids[col], round(score, 4)] for col, score in top.get(row_of[pid], [])]
+        recomputed_set = set(recomputed)
+        updated = changed_set | listing
+        for pid in changed:
+            # Similarity is symmetric, so the new scores may also enter other posts' lists.
+            for other, score in self.related[pid]:
+                if other in recomputed_set:
+                    continue
+                others = self.related.setdefault(other, [])
+                others.append([pid, score])
+                others.sort(key=lambda pair: -pair[1])
+                del others[self.top_k:]
+                if any(pair[0] == pid for pair in others):
+                    updated.add(other)
+        return updated
+
+    def _rebuild_changed(self, updated):
+        """Full rebuild; returns `updated` plus every post whose related list changed"""
+        before = self._neighbours()
+        self.rebuild()
+        return updated | {pid for pid, neighbours in self._neighbours().items() if before.get(pid) != neighbours}
+
+    def related_for(self, post):
+        """Related posts for a post as [{'post_id', 'title'}], best match first"""
+        return [
+            {'post_id': other, 'title': self.posts[other]['title']}
+            for other, _ in self.related.get(post_id(post), [])
+            if other in self.posts
+        ]
+
+    def annotate(self, posts):
+        """Set post['related'] on each post from the current index"""
+        # Scores are left out so that IDF drift alone does not make a post look changed to the ledger.
+        for post in posts:
+            post['related'] = self.related_for(post)
+        return posts
+
+
+def run_benchmark(num_posts=100000):
+    rng = random.Random(7)
+    nouns = [f"product{i}" for i in range(3000)]
+    modifiers = ["wireless", "smart", "portable", "organic", "ergonomic", "compact", "premium", "budget"] + [f"feature{i}" for i in range(500)]
+    categories = ["electronics", "home-kitchen", "fashion", "toys-games", "beauty", "sports-outdoors"]
+    posts = []
+    for i in range(num_posts):
+        noun = rng.choice(nouns)
+        name = f"{rng.choice(modifiers)} {noun} {rng.choice(modifiers)}"
+        posts.append({
+            'title': f"Why the {name} is trending {i}",
+            'product_name': f"{name} model {i}",
+            'category': rng.choice(categories),
+            'keywords': [f"best {noun}", f"{noun} review", f"{rng.choice(modifiers)} {noun}", f"{name} buying guide"]
+        })
+    related = RelatedPosts(path=None)
+    start = time.perf_counter()
+    related.add_posts(posts)
+    print(f"Full build over {num_posts} posts: {time.perf_counter() - start:.1f}s")
+    extra = [dict(p, product_name=p['product_name'] + " v2") for p in posts[:100]]
+    start = time.perf_counter()
+    related.add_posts(extra)
+    print(f"Incremental update of 100 posts: {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the related-posts index")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Time a full build over N synthetic posts")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+    else:
+        blog_posts = read_posts_json("data/blog_posts.json")
+        index = RelatedPosts()
+        index.add_posts(blog_posts)
+        index.save()
+        for blog_post in blog_posts[:3]:
+            print(blog_post['title'])
+            for item in index.related_for(blog_post):
+                print(f"  {item['title']}")
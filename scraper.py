@@ -3,8 +3,9 @@ import time
 import random 
 import logging 
 import requests 
-import pandas as pd 
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup 
+from records import Product, RecordValidationError, write_products_csv
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 
@@ -58,15 +59,18 @@ class AmazonProductScraper:
                 img_elem = (item.select_one('img.s-image') or
                             item.select_one('img.a-dynamic-image'))
                 
-                product = {
-                    'name': name_elem.get_text(strip=True) if name_elem else "Unknown Product",
+                product = Product.from_dict({
+                    'name': name_elem.get_text(strip=True) if name_elem else "",
                     'price': price_elem.get_text(strip=True) if price_elem else "Price not available",
                     'rating': rating_elem.get_text(strip=True) if rating_elem else "No ratings",
-                    'url': self.base_url + url_elem('href') if url_elem and url_elem.has_attr('href') else " ",
-                    'image_url': img_elem('src') if img_elem and img_elem.has_attr('src') else " ",
+                    'url': urljoin(self.base_url, url_elem['href']) if url_elem and url_elem.has_attr('href') else "",
+                    'image_url': img_elem['src'] if img_elem and img_elem.has_attr('src') else "",
                     'category': category
-                }
+                })
                 products.append(product)
+            except RecordValidationError as err:
+                logging.warning(f"Skipping invalid product: {err}")
+                continue
             except Exception as err:
                 logging.error(f"Error extracting product info: {err}")
                 continue 
@@ -80,8 +84,7 @@ class AmazonProductScraper:
             return False 
         
         try:
-            df = pd.DataFrame(products)
-            df.to_csv(filename, index=False)
+            write_products_csv(products, filename)
             logging.info(f"Successfully saved {len(products)} products to '{filename}'.")
             return True 
         except Exception as e:
@@ -0,0 +1,535 @@
+import os
+import re
+import html
+import math
+import time
+import heapq
+import random
+import sqlite3
+import argparse
+import itertools
+import tempfile
+import threading
+from collections import Counter
+from dotenv import load_dotenv
+from publish_ledger import PublishLedger, post_id, content_hash
+from records import read_posts_json
+
+load_dotenv()
+
+SEARCH_DB = os.getenv("SEARCH_INDEX_DB", "data/search_index.db")
+
+# Field weights: matches in the title and the chosen SEO keywords say more about a
+# post than a passing mention in the body.
+FIELD_WEIGHTS = (('title', 10.0), ('keywords', 5.0), ('content', 1.0))
+# BM25 parameters. Impacts are computed once at index time against a fixed average
+# length (generated posts are 150-200 words, ~100 terms after stop words), so adding
+# posts never forces existing postings to be rewritten.
+K1 = 1.2
+B = 0.75
+AVG_DOC_LENGTH = 100
+# Impacts are stored as integers (impact * IMPACT_SCALE), which SQLite packs into one
+# or two bytes instead of an 8-byte float.
+IMPACT_SCALE = 1000
+# Upper bound on the rows counted for the reported total of a multi-term or filtered
+# query; beyond it the total is reported as a lower bound ("1000+").
+MAX_EXACT_TOTAL = 1000
+# Queries whose rarest term (or keyword filter) matches at most this many posts score
+# every match; larger ones use a threshold top-k over the impact-ordered lists.
+EXHAUSTIVE_LIMIT = 2000
+# Postings read per list in each top-k round.
+TOP_K_BLOCK = 256
+# Budget of postings lookups for one top-k query: each posting read from one term's
+# list costs a lookup in every other term's list, so depth shrinks as terms are added.
+MAX_TOP_K_LOOKUPS = 4096
+# Postings of the rarest term examined when counting matches for a top-k query.
+MAX_COUNT_SCAN = 20000
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "its", "of", "on", "or", "that", "the", "this", "to", "was", "were", "will", "with", "you", "your"
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens without stop words, with a light plural strip"""
+    terms = []
+    for token in re.findall(r"[a-z0-9]+", str(text).lower()):
+        if token in STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+def post_terms(post, keywords):
+    """Weighted term frequencies and the body length used for BM25 length normalization"""
+    fields = {'title': post.get('title', ''), 'keywords': ' '.join(keywords), 'content': post.get('content', '')}
+    weighted = Counter()
+    length = 0
+    for field, weight in FIELD_WEIGHTS:
+        tokens = tokenize(fields[field])
+        if field == 'content':
+            length = len(tokens)
+        for token in tokens:
+            weighted[token] += weight
+    return weighted, length
+
+
+def impacts(post, keywords):
+    weighted, length = post_terms(post, keywords)
+    norm = K1 * (1 - B + B * length / AVG_DOC_LENGTH)
+    return {term: tf * (K1 + 1) / (tf + norm) for term, tf in weighted.items()}
+
+
+def make_snippet(content, terms, width=24):
+    """Window of the post text around the first query term, HTML-escaped, with matches in <mark>"""
+    content = str(content)
+    wanted = set(terms)
+    # Locate the first hit with one regex pass instead of tokenizing every word; the
+    # optional "s" covers the plural strip in tokenize, and each hit is re-checked.
+    pattern = re.compile(r"(?<![a-z0-9])(?:" + "|".join(map(re.escape, wanted)) + r")s?(?![a-z0-9])", re.IGNORECASE)
+    hit = 0
+    for match in pattern.finditer(content):
+        if not wanted.isdisjoint(tokenize(match.group())):
+            hit = len(content[:match.start()].split())
+            break
+    words = content.split()
+    start = max(0, hit - width // 3)
+    marked = []
+    for word in words[start:start + width]:
+        escaped = html.escape(word)
+        marked.append(escaped if wanted.isdisjoint(tokenize(word)) else f"<mark>{escaped}</mark>")
+    prefix = "..." if start > 0 else ""
+    suffix = "..." if start + width < len(words) else ""
+    return prefix + " ".join(marked) + suffix
+
+
+class SearchIndex:
+    """On-disk inverted index over generated posts with impact-ordered postings.
+
+    Each posting stores the post's precomputed BM25 contribution ("impact") for the
+    term, and postings are kept sorted by impact, so the best page for a term is a
+    short index range scan instead of scoring every matching post.
+    """
+
+    def __init__(self, db_path=SEARCH_DB):
+        self.db_path = db_path
+        self._local = threading.local()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        conn = self._connection()
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                post_id TEXT UNIQUE NOT NULL,
+                content_hash TEXT NOT NULL,
+                title TEXT NOT NULL,
+                category TEXT,
+                keywords TEXT,
+                url TEXT,
+                date_created TEXT,
+                content TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_docs_category ON docs (category, id);
+            CREATE TABLE IF NOT EXISTS doc_keywords (
+                keyword TEXT NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (keyword, doc_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                term TEXT UNIQUE NOT NULL,
+                df INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                impact INTEGER NOT NULL,
+                PRIMARY KEY (term_id, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_impact ON postings (term_id, impact DESC);
+        """)
+
+    def _connection(self):
+        # Flask serves requests from several threads and sqlite3 connections are per-thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA cache_size=-65536")
+            self._local.conn = conn
+        return conn
+
+    def _stage_post(self, conn, post, url, postings, removed, df_changes, keyword_rows):
+        """Write the docs row for a post and collect its postings; False if unchanged"""
+        pid = post_id(post)
+        digest = content_hash(post)
+        row = conn.execute("SELECT id, content_hash, title, keywords, content, url FROM docs WHERE post_id = ?", (pid,)).fetchone()
+        if row and row[1] == digest:
+            if url and url != row[5]:
+                # Same content under a new page (e.g. a suffixed filename): only the link moves.
+                conn.execute("UPDATE docs SET url = ? WHERE id = ?", (url, row[0]))
+            return False
+        keywords = post.get('keywords', [])
+        if isinstance(keywords, str):
+            keywords = [k.strip() for k in keywords.split(',') if k.strip()]
+        values = (digest, post['title'], post.get('category'), ', '.join(keywords), url, post.get('date_created'), post.get('content', ''))
+        if row:
+            doc_id = row[0]
+            old_post = {'title': row[2], 'content': row[4]}
+            old_keywords = [k for k in (row[3] or '').split(', ') if k]
+            old_terms = post_terms(old_post, old_keywords)[0].keys()
+            removed.extend((term, doc_id) for term in old_terms)
+            conn.execute("DELETE FROM doc_keywords WHERE doc_id = ?", (doc_id,))
+            df_changes.subtract(old_terms)
+            conn.execute(
+                "UPDATE docs SET content_hash = ?, title = ?, category = ?, keywords = ?, url = ?, date_created = ?, content = ? WHERE id = ?",
+                values + (doc_id,)
+            )
+        else:
+            doc_id = conn.execute(
+                "INSERT INTO docs (post_id, content_hash, title, category, keywords, url, date_created, content) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pid,) + values
+            ).lastrowid
+        term_impacts = impacts(post, keywords)
+        postings.extend((term, doc_id, round(impact * IMPACT_SCALE)) for term, impact in term_impacts.items())
+        df_changes.update(term_impacts.keys())
+        keyword_rows.extend((k.lower(), doc_id) for k in keywords)
+        return True
+
+    def add_posts(self, posts, urls=None):
+        """Index or re-index posts; posts already indexed unchanged are skipped. Returns the number written
+
+        urls maps post_id(post) to the URL of the post's page.
+        """
+        urls = urls or {}
+        conn = self._connection()
+        postings, removed, df_changes, keyword_rows = [], [], Counter(), []
+        added = 0
+        # Postings are written after staging, so a post may only be staged once per batch.
+        latest = {post_id(post): post for post in posts}
+        for post in latest.values():
+            added += self._stage_post(conn, post, urls.get(post_id(post)), postings, removed, df_changes, keyword_rows)
+        conn.executemany(
+            "INSERT INTO terms (term, df) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET df = df + excluded.df",
+            sorted(df_changes.items())
+        )
+        term_ids = self._term_ids(conn, df_changes.keys())
+        conn.executemany(
+            "DELETE FROM postings WHERE term_id = ? AND doc_id = ?",
+            [(term_ids[term], doc_id) for term, doc_id in removed]
+        )
+        # Inserting in key order keeps B-tree writes sequential, which matters once the
+        # postings outgrow the page cache.
+        conn.executemany(
+            "INSERT INTO postings (term_id, doc_id, impact) VALUES (?, ?, ?)",
+            sorted((term_ids[term], doc_id, impact) for term, doc_id, impact in postings)
+        )
+        conn.executemany("INSERT OR IGNORE INTO doc_keywords (keyword, doc_id) VALUES (?, ?)", sorted(keyword_rows))
+        conn.commit()
+        return added
+
+    @staticmethod
+    def _term_ids(conn, terms, chunk_size=500):
+        terms = list(terms)
+        ids = {}
+        for start in range(0, len(terms), chunk_size):
+            chunk = terms[start:start + chunk_size]
+            placeholders = ", ".join("?" for _ in chunk)
+            ids.update(conn.execute(f"SELECT term, id FROM terms WHERE term IN ({placeholders})", chunk).fetchall())
+        return ids
+
+    def add_post(self, post, url=None):
+        """Index or re-index one post; returns False if it is already indexed unchanged"""
+        return bool(self.add_posts([post], {post_id(post): url}))
+
+    def build_from_json(self, posts_file="data/blog_posts.json", html_dir="output/html", ledger=None):
+        """Incrementally index blog_posts.json; posts already indexed unchanged are skipped"""
+        posts = read_posts_json(posts_file)
+        # Page filenames come from the publish ledger: a page may carry a post-ID suffix
+        # or an older title, so it cannot be derived from the current title.
+        own_ledger = ledger is None
+        ledger = ledger or PublishLedger()
+        html_dir = os.path.abspath(html_dir)
+        urls = {}
+        try:
+            for post in posts:
+                entry = ledger.get(post_id(post), 'html')
+                if entry and entry['remote_id'] and os.path.exists(entry['remote_id']):
+                    page = os.path.abspath(entry['remote_id'])
+                    if os.path.dirname(page) == html_dir:
+                        urls[post_id(post)] = f"/post/{os.path.basename(page)}"
+        finally:
+            if own_ledger:
+                ledger.close()
+        return self.add_posts(posts, urls)
+
+    def count(self):
+        # Posts are only ever added or updated, never deleted, so the highest rowid is
+        # the document count; unlike COUNT(*) it does not scan the table.
+        return self._connection().execute("SELECT COALESCE(MAX(id), 0) FROM docs").fetchone()[0]
+
+    @staticmethod
+    def _match_sql(query, doc_column, skip_term=None, skip_keyword=False):
+        """JOIN clauses and their params, and score expressions and their params, that
+        require every query term (except skip_term) and the filters for the doc in
+        doc_column. The idf factors are bound rather than inlined so the statement cache
+        gets reused across queries."""
+        terms, term_ids, idf, category, keyword = query
+        joins, params, score, score_params = [], [], [], []
+        # Filters first: their covering indexes are small and cheap to probe, and they
+        # discard most candidates before any postings lookup.
+        if category:
+            joins.append(f"CROSS JOIN docs d INDEXED BY idx_docs_category ON d.category = ? AND d.id = {doc_column}")
+            params.append(category)
+        if keyword and not skip_keyword:
+            joins.append(f"CROSS JOIN doc_keywords k ON k.keyword = ? AND k.doc_id = {doc_column}")
+            params.append(keyword)
+        for i, term in enumerate(t for t in terms if t != skip_term):
+            joins.append(f"CROSS JOIN postings p{i + 1} ON p{i + 1}.term_id = ? AND p{i + 1}.doc_id = {doc_column}")
+            params.append(term_ids[term])
+            score.append(f"? * p{i + 1}.impact")
+            score_params.append(idf[term] / IMPACT_SCALE)
+        return " ".join(joins), params, score, score_params
+
+    def _scan(self, conn, query, term, floor=None, ceiling=None):
+        """{doc: score} for matches among term's postings with floor <= impact < ceiling"""
+        terms, term_ids, idf, category, keyword = query
+        joins, params, score, score_params = self._match_sql(query, "p0.doc_id", skip_term=term)
+        where, where_params = ["p0.term_id = ?"], [term_ids[term]]
+        if floor is not None:
+            where.append("p0.impact >= ?")
+            where_params.append(floor)
+        if ceiling is not None:
+            where.append("p0.impact < ?")
+            where_params.append(ceiling)
+        score.insert(0, "? * p0.impact")
+        score_params.insert(0, idf[term] / IMPACT_SCALE)
+        return dict(conn.execute(
+            f"SELECT p0.doc_id, {' + '.join(score)} FROM postings p0 {joins} WHERE {' AND '.join(where)}",
+            score_params + params + where_params
+        ))
+
+    def _score_all(self, conn, query, dfs, keyword_docs):
+        """Score every match, driven by the smallest posting list or keyword filter"""
+        terms, term_ids, idf, category, keyword = query
+        rarest = min(terms, key=dfs.get)
+        if keyword_docs is None or keyword_docs >= dfs[rarest]:
+            return self._scan(conn, query, rarest)
+        joins, params, score, score_params = self._match_sql(query, "kw.doc_id", skip_keyword=True)
+        return dict(conn.execute(
+            f"SELECT kw.doc_id, {' + '.join(score)} FROM doc_keywords kw {joins} WHERE kw.keyword = ?",
+            score_params + params + [keyword]
+        ))
+
+    def _top_k(self, conn, query, k):
+        """Threshold-algorithm top-k over the impact-ordered posting lists.
+
+        Each round takes the next TOP_K_BLOCK postings of every term's list, in impact
+        order, and scores the matches among them inside SQLite with primary-key lookups
+        for the other terms and the filters. No unseen doc can score more than the sum of
+        the impacts reached so far, so reading stops once k docs reach that bound. Since
+        every term is required, an exhausted list means every match has been seen.
+        Lists with near-uniform impacts would otherwise be read almost in full, so
+        reading also stops once MAX_TOP_K_LOOKUPS is spent; the ranking is then the best
+        among docs that are near the top of at least one term's list.
+        Returns (scores, complete) where complete is True if every match was scored.
+        """
+        terms, term_ids, idf, category, keyword = query
+        scores = {}
+        ceilings = dict.fromkeys(terms)
+        max_depth = max(2 * k, MAX_TOP_K_LOOKUPS // (len(terms) * max(1, len(terms) - 1)))
+        depth, block = 0, max(TOP_K_BLOCK, k)
+        while depth < max_depth:
+            # Blocks double each round, so a deep read takes a few statements, not many.
+            depth, block = min(depth + block, max_depth), block * 2
+            for term in terms:
+                row = conn.execute(
+                    "SELECT impact FROM postings WHERE term_id = ? ORDER BY impact DESC LIMIT 1 OFFSET ?",
+                    (term_ids[term], depth - 1)
+                ).fetchone()
+                if row is None:
+                    scores.update(self._scan(conn, query, term, ceiling=ceilings[term]))
+                    return scores, True
+                # Ties on the floor impact are read now, so the next round starts below it.
+                scores.update(self._scan(conn, query, term, row[0], ceilings[term]))
+                ceilings[term] = row[0]
+            bound = sum(idf[t] * ceilings[t] / IMPACT_SCALE for t in terms)
+            if len(scores) >= k and heapq.nlargest(k, scores.values())[-1] >= bound:
+                break
+        return scores, False
+
+    def _count_matches(self, conn, query, dfs):
+        """(total, exact) for the result count: at most MAX_EXACT_TOTAL + 1 matches are
+        counted, among the first MAX_COUNT_SCAN entries of the smaller of the rarest
+        term's postings and the category"""
+        terms, term_ids, idf, category, keyword = query
+        rarest = min(terms, key=dfs.get)
+        category_size = conn.execute(
+            "SELECT COUNT(*) FROM docs INDEXED BY idx_docs_category WHERE category = ?", (category,)
+        ).fetchone()[0] if category else None
+        if category_size is not None and category_size < dfs[rarest]:
+            joins, params, _, _ = self._match_sql((terms, term_ids, idf, None, keyword), "c.id")
+            source, size = "docs c INDEXED BY idx_docs_category", category_size
+            where, where_params = "c.category = ?", [category]
+            if size > MAX_COUNT_SCAN:
+                last = conn.execute(
+                    "SELECT id FROM docs INDEXED BY idx_docs_category WHERE category = ? ORDER BY id LIMIT 1 OFFSET ?",
+                    (category, MAX_COUNT_SCAN)
+                ).fetchone()[0]
+                where += " AND c.id < ?"
+                where_params.append(last)
+        else:
+            joins, params, _, _ = self._match_sql(query, "p0.doc_id", skip_term=rarest)
+            source, size = "postings p0", dfs[rarest]
+            where, where_params = "p0.term_id = ?", [term_ids[rarest]]
+            if size > MAX_COUNT_SCAN:
+                # An impact floor rather than a LIMIT subquery, which SQLite would materialize.
+                floor = conn.execute(
+                    "SELECT impact FROM postings WHERE term_id = ? ORDER BY impact DESC LIMIT 1 OFFSET ?",
+                    (term_ids[rarest], MAX_COUNT_SCAN)
+                ).fetchone()[0]
+                where += " AND p0.impact > ?"
+                where_params.append(floor)
+        total = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {source} {joins} WHERE {where} LIMIT {MAX_EXACT_TOTAL + 1})",
+            params + where_params
+        ).fetchone()[0]
+        exact = total <= MAX_EXACT_TOTAL and size <= MAX_COUNT_SCAN
+        return min(total, MAX_EXACT_TOTAL), exact
+
+    def search(self, query, category=None, keyword=None, page=1, per_page=10):
+        """Ranked search with optional category/keyword filters.
+
+        Returns {'total', 'total_is_exact', 'page', 'per_page', 'results'}.
+        """
+        empty = {'total': 0, 'total_is_exact': True, 'page': page, 'per_page': per_page, 'results': []}
+        terms = list(dict.fromkeys(tokenize(query or "")))
+        if not terms:
+            return empty
+        conn = self._connection()
+        placeholders = ", ".join("?" for _ in terms)
+        rows = conn.execute(f"SELECT term, id, df FROM terms WHERE term IN ({placeholders}) AND df > 0", terms).fetchall()
+        if len(rows) < len(terms):
+            return empty
+        term_ids = {term: term_id for term, term_id, df in rows}
+        dfs = {term: df for term, term_id, df in rows}
+        total_docs = self.count()
+        idf = {t: math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) for t, df in dfs.items()}
+
+        offset = (page - 1) * per_page
+        if len(terms) == 1 and not category and not keyword:
+            # One term: impact order is score order, so SQLite walks idx_postings_impact
+            # and stops as soon as the page is filled.
+            factor = idf[terms[0]] / IMPACT_SCALE
+            ranked = [
+                (doc_id, factor * impact) for doc_id, impact in conn.execute(
+                    "SELECT doc_id, impact FROM postings WHERE term_id = ? ORDER BY impact DESC LIMIT ? OFFSET ?",
+                    (term_ids[terms[0]], per_page, offset)
+                )
+            ]
+            total, exact = dfs[terms[0]], True
+        else:
+            query = (terms, term_ids, idf, category, keyword.lower() if keyword else None)
+            keyword_docs = conn.execute(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM doc_keywords WHERE keyword = ? LIMIT ?)", (query[4], EXHAUSTIVE_LIMIT + 1)
+            ).fetchone()[0] if keyword else None
+            if min(dfs.values()) <= EXHAUSTIVE_LIMIT or (keyword_docs is not None and keyword_docs <= EXHAUSTIVE_LIMIT):
+                scores, complete = self._score_all(conn, query, dfs, keyword_docs), True
+            else:
+                scores, complete = self._top_k(conn, query, offset + per_page)
+            wanted = offset + per_page
+            cutoff = heapq.nlargest(wanted, scores.values())[-1] if len(scores) > wanted else float("-inf")
+            # Sorting only what can reach the page; ties are broken by doc id so pages are stable.
+            ranked = sorted((doc_id, score) for doc_id, score in scores.items() if score >= cutoff)
+            ranked.sort(key=lambda item: -item[1])
+            ranked = ranked[offset:wanted]
+            if complete or len(scores) > MAX_EXACT_TOTAL:
+                # Either every match was scored, or enough were to know the total is "1000+".
+                total, exact = min(len(scores), MAX_EXACT_TOTAL), complete and len(scores) <= MAX_EXACT_TOTAL
+            else:
+                total, exact = self._count_matches(conn, query, dfs)
+
+        results = []
+        for doc_id, doc_score in ranked:
+            title, doc_category, keywords, url, date_created, content = conn.execute(
+                "SELECT title, category, keywords, url, date_created, content FROM docs WHERE id = ?", (doc_id,)
+            ).fetchone()
+            results.append({
+                'title': title, 'category': doc_category,
+                'keywords': [k for k in (keywords or '').split(', ') if k],
+                'url': url, 'date_created': date_created,
+                'snippet': make_snippet(content, terms),
+                'score': round(doc_score, 4)
+            })
+        return {'total': total, 'total_is_exact': exact, 'page': page, 'per_page': per_page, 'results': results}
+
+
+def run_benchmark(num_posts=100000, queries=200):
+    words = [
+        "wireless", "bluetooth", "earbuds", "noise", "cancellation", "smart", "home", "security", "camera",
+        "ceramic", "cookware", "ergonomic", "office", "chair", "lumbar", "athletic", "shirt", "knife",
+        "speaker", "bass", "air", "fryer", "dumbbell", "gym", "bedding", "duvet", "organic", "cotton",
+        "portable", "premium", "review", "best", "budget", "durable", "compact", "lightweight", "kitchen"
+    ] + [f"term{i}" for i in range(20000)]
+    # Word frequencies in real text are roughly Zipfian; a uniform vocabulary would make
+    # every term match a large slice of the catalog.
+    cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(words) + 1)))
+    categories = ["electronics", "home-kitchen", "fashion", "toys-games", "beauty", "sports-outdoors"]
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SearchIndex(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        batch = []
+        for i in range(num_posts):
+            keywords = [' '.join(rng.sample(words[:37], 2)) for _ in range(4)]
+            batch.append({
+                'title': f"{' '.join(rng.sample(words, 5)).title()} {i}",
+                'content': ' '.join(rng.choices(words, cum_weights=cum_weights, k=180)),
+                'product_name': f"product {i}",
+                'category': rng.choice(categories),
+                'keywords': keywords
+            })
+            if len(batch) == 5000:
+                index.add_posts(batch)
+                batch = []
+        index.add_posts(batch)
+        print(f"Indexed {index.count()} posts in {time.perf_counter() - start:.1f}s "
+              f"({os.path.getsize(index.db_path) / 1e6:.0f} MB)")
+
+        cases = [
+            ("rare term", lambda: {'query': rng.choice(words[2000:])}),
+            ("mid-frequency term", lambda: {'query': rng.choice(words[37:2000])}),
+            ("most common term", lambda: {'query': rng.choice(words[:37])}),
+            ("common term, page 5", lambda: {'query': rng.choice(words[:37]), 'page': 5}),
+            ("common + rare term", lambda: {'query': f"{rng.choice(words[:37])} {rng.choice(words[200:])}"}),
+            ("two common terms", lambda: {'query': ' '.join(rng.sample(words[:37], 2))}),
+            ("three common terms", lambda: {'query': ' '.join(rng.sample(words[:37], 3))}),
+            ("two common, page 5", lambda: {'query': ' '.join(rng.sample(words[:37], 2)), 'page': 5}),
+            ("term + category", lambda: {'query': rng.choice(words[37:2000]), 'category': rng.choice(categories)}),
+            ("common term + category", lambda: {'query': rng.choice(words[:37]), 'category': rng.choice(categories)}),
+            ("term + keyword", lambda: {'query': rng.choice(words[37:2000]), 'keyword': ' '.join(rng.sample(words[:37], 2))}),
+        ]
+        for label, make in cases:
+            timings = []
+            for _ in range(queries):
+                kwargs = make()
+                start = time.perf_counter()
+                index.search(**kwargs)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            print(f"{label:>22}: p50 {timings[len(timings) // 2]:.2f}ms  p95 {timings[int(len(timings) * 0.95)]:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the post search index")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="Benchmark queries over N synthetic posts")
+    args = parser.parse_args()
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+    else:
+        added = SearchIndex().build_from_json()
+        print(f"Indexed {added} new or changed posts")
@@ -1,8 +1,61 @@
-from flask import Flask, render_template_string, send_from_directory, abort
+from flask import Flask, Response, render_template_string, send_from_directory, abort, stream_with_context, request, jsonify
 import os
+import csv
+import json
+import html
+import logging
+import threading
+from metrics import RequestMetrics, MetricsMiddleware, UNMATCHED_ROUTE
 
 app = Flask(__name__)
 OUTPUT_DIR = os.path.join(os.getcwd(), "output", "html")
+PRODUCTS_FILE = os.path.join(os.getcwd(), "data", "product_keywords.csv")
+POSTS_FILE = os.path.join(os.getcwd(), "data", "blog_posts.json")
+_generator = None
+_search_index = None
+# Completed preview text per (product, keywords): every preview is a paid completion,
+# so reloading the page or reconnecting replays it instead of generating again.
+_previews = {}
+_previews_lock = threading.Lock()
+
+# Request metrics for /metrics, recorded around the whole WSGI app so streamed
+# responses are timed and measured up to their last byte
+metrics = RequestMetrics()
+app.wsgi_app = MetricsMiddleware(app.wsgi_app, metrics)
+
+@app.before_request
+def tag_route():
+    # Label by the matched rule (e.g. /post/<path:filename>) rather than the raw path
+    request.environ['metrics.route'] = request.url_rule.rule if request.url_rule else UNMATCHED_ROUTE
+
+def get_generator():
+    # Created on first use so the listing pages don't pay for the generator import
+    global _generator
+    if _generator is None:
+        from content_generator import BlogContentGenerator
+        _generator = BlogContentGenerator()
+    return _generator
+
+def get_search_index():
+    # The publisher keeps the index current; on first use also pick up anything in
+    # blog_posts.json that was generated before the index existed.
+    global _search_index
+    if _search_index is None:
+        from search_index import SearchIndex
+        _search_index = SearchIndex()
+        if os.path.exists(POSTS_FILE):
+            _search_index.build_from_json(POSTS_FILE, OUTPUT_DIR)
+    return _search_index
+
+def load_product(index):
+    try:
+        with open(PRODUCTS_FILE, newline='', encoding='utf-8') as f:
+            products = list(csv.DictReader(f))
+    except OSError:
+        abort(404, description="No product keywords available.")
+    if not 0 <= index < len(products):
+        abort(404, description=f"No product at index {index}.")
+    return products[index]
 
 @app.route("/")
 def index():
@@ -29,12 +82,89 @@ def index():
     except Exception as e:
         return f"Error: {e}", 500
 
-@app.route("/post/<filename>")
+@app.route("/post/<path:filename>")
 def post(filename):
+    # <path:> so the local image cache under output/html/images is served too
     try:
         return send_from_directory(OUTPUT_DIR, filename)
     except Exception as e:
         abort(404, description=f"Post not found: {e}")
 
+@app.route("/search")
+def search():
+    """Ranked full-text search: /search?q=...&category=...&keyword=...&page=1&per_page=10"""
+    query = request.args.get("q", "")
+    page = max(1, request.args.get("page", 1, type=int))
+    per_page = min(100, max(1, request.args.get("per_page", 10, type=int)))
+    results = get_search_index().search(
+        query,
+        category=request.args.get("category") or None,
+        keyword=request.args.get("keyword") or None,
+        page=page,
+        per_page=per_page
+    )
+    return jsonify(query=query, **results)
+
+@app.route("/preview/<int:index>")
+def preview(index):
+    product = load_product(index)
+    return f"""
+    <!DOCTYPE html>
+    <html>
+    <head>
+        <meta charset="UTF-8">
+        <title>Preview: {html.escape(product['name'])}</title>
+    </head>
+    <body>
+        <h1>{html.escape(product['name'])}</h1>
+        <div id="content" style="white-space: pre-wrap;"></div>
+        <script>
+            const source = new EventSource("/preview/{index}/stream");
+            const content = document.getElementById("content");
+            source.onmessage = (event) => {{ content.textContent += JSON.parse(event.data).delta; }};
+            source.addEventListener("done", () => source.close());
+            // EventSource reconnects on its own after an error, which would pay for a new completion
+            source.onerror = () => source.close();
+        </script>
+    </body>
+    </html>
+    """
+
+@app.route("/preview/<int:index>/stream")
+def preview_stream(index):
+    """Stream a post for the product as it is generated, as server-sent events"""
+    product = load_product(index)
+    generator = get_generator()
+    keywords = generator.parse_keywords(product)
+    key = (product['name'], tuple(keywords))
+
+    def events():
+        with _previews_lock:
+            cached = _previews.get(key)
+        if cached is not None:
+            yield f"data: {json.dumps({'delta': cached})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+            return
+        chunks = []
+        try:
+            for chunk in generator.stream_content_with_openai(product, keywords):
+                chunks.append(chunk)
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        except Exception as e:
+            logging.error(f"Preview for '{product['name']}' failed: {e}")
+            yield "event: error\ndata: {}\n\n"
+            return
+        with _previews_lock:
+            _previews[key] = "".join(chunks)
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of this process's request metrics"""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True)
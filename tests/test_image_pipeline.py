@@ -0,0 +1,138 @@
+import io
+import os
+import tempfile
+import threading
+import unittest
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from image_pipeline import ImagePipeline, PIL_AVAILABLE, picture_html
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+
+def image_bytes(color, size=(1200, 800), fmt="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class StubImageServer:
+    """Serves fixed responses by path and counts requests per path"""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.hits = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.hits[self.path] = stub.hits.get(self.path, 0) + 1
+                if self.path not in stub.routes:
+                    self.send_error(404)
+                    return
+                content_type, body = stub.routes[self.path]
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server.server_address[1]}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@unittest.skipUnless(PIL_AVAILABLE, "Pillow is not installed")
+class ImagePipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache_dir = os.path.join(self.tmp.name, "images")
+        red = image_bytes("red")
+        self.stub = StubImageServer({
+            "/a.png": ("image/png", red),
+            "/mirror/a.png": ("image/png", red),
+            "/b.jpg": ("image/jpeg", image_bytes("blue", (500, 500), "JPEG")),
+            "/page.html": ("text/html", b"<html>not an image</html>"),
+            "/broken.png": ("image/png", b"\x89PNG not really"),
+        })
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+
+    def pipeline(self):
+        return ImagePipeline(cache_dir=self.cache_dir, workers=2, fetch_workers=4)
+
+    def test_identical_bytes_are_stored_once(self):
+        pipeline = self.pipeline()
+        pipeline.prefetch([self.stub.url("/a.png"), self.stub.url("/mirror/a.png")])
+
+        first = pipeline.record_for(self.stub.url("/a.png"))
+        second = pipeline.record_for(self.stub.url("/mirror/a.png"))
+        self.assertEqual(first['digest'], second['digest'])
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, "originals")), [os.path.basename(first['original'])])
+
+    def test_thumbnails_and_picture_html(self):
+        pipeline = self.pipeline()
+        pipeline.prefetch([self.stub.url("/a.png"), self.stub.url("/b.jpg")])
+
+        record = pipeline.record_for(self.stub.url("/a.png"))
+        self.assertEqual([w for w, _ in record['variants']['webp']], [320, 640, 1024])
+        for fmt in ("webp", "jpeg"):
+            for _, name in record['variants'][fmt]:
+                self.assertTrue(os.path.exists(os.path.join(self.cache_dir, name)))
+        # Never upscaled: a 500px image gets 320px and 500px variants only.
+        small = pipeline.record_for(self.stub.url("/b.jpg"))
+        self.assertEqual([w for w, _ in small['variants']['jpeg']], [320, 500])
+
+        markup = picture_html(record, "images", 'Red "thing"')
+        self.assertIn('<source type="image/webp"', markup)
+        self.assertIn(f"images/{record['variants']['jpeg'][0][1]} 320w", markup)
+        self.assertIn('width="1024" height="683"', markup)
+        self.assertIn('alt="Red &quot;thing&quot;"', markup)
+        self.assertIn('loading="lazy"', markup)
+
+    def test_non_image_responses_are_rejected(self):
+        pipeline = self.pipeline()
+        pipeline.prefetch([self.stub.url("/page.html"), self.stub.url("/missing.png")])
+
+        self.assertIsNone(pipeline.record_for(self.stub.url("/page.html")))
+        self.assertIsNone(pipeline.record_for(self.stub.url("/missing.png")))
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, "originals")), [])
+
+    def test_undecodable_image_is_not_retried(self):
+        pipeline = self.pipeline()
+        broken = self.stub.url("/broken.png")
+        pipeline.prefetch([broken])
+        self.assertTrue(pipeline.record_for(broken)['failed'])
+
+        self.assertEqual(pipeline.prefetch([broken, self.stub.url("/a.png")]), 1)
+        self.assertEqual(self.stub.hits["/broken.png"], 1)
+
+    def test_manifest_is_shared_across_instances(self):
+        self.pipeline().prefetch([self.stub.url("/a.png")])
+        self.pipeline().prefetch([self.stub.url("/b.jpg")])
+
+        # A new instance sees entries appended by both earlier ones without refetching.
+        fresh = self.pipeline()
+        self.assertEqual(fresh.prefetch([self.stub.url("/a.png"), self.stub.url("/b.jpg")]), 0)
+        self.assertIn('variants', fresh.record_for(self.stub.url("/b.jpg")))
+        self.assertEqual(self.stub.hits, {"/a.png": 1, "/b.jpg": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
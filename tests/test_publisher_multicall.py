@@ -0,0 +1,149 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from xmlrpc.client import Fault
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+
+from publish_ledger import PublishLedger
+from publisher import BlogPublisher, WP_AVAILABLE
+from search_index import SearchIndex
+
+
+class QuietHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ("/xmlrpc.php",)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubWordPress:
+    """Minimal WordPress XML-RPC endpoint: wp.newPost, wp.editPost and optionally system.multicall"""
+
+    def __init__(self, multicall=True):
+        self.server = SimpleXMLRPCServer(("127.0.0.1", 0), requestHandler=QuietHandler, allow_none=True, logRequests=False)
+        self.posts = {}
+        self.edits = []
+        self.multicalls = []
+        self.next_id = 100
+        methods = ["wp.newPost", "wp.editPost"] + (["system.multicall"] if multicall else [])
+        self.server.register_function(lambda: methods, "mt.supportedMethods")
+        self.server.register_function(self.new_post, "wp.newPost")
+        self.server.register_function(self.edit_post, "wp.editPost")
+        if multicall:
+            self.server.register_function(self.multicall, "system.multicall")
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def new_post(self, blog_id, username, password, content):
+        if "fail" in content["post_title"].lower():
+            raise Fault(500, f"Rejected: {content['post_title']}")
+        self.next_id += 1
+        self.posts[str(self.next_id)] = content
+        return str(self.next_id)
+
+    def edit_post(self, blog_id, username, password, remote_id, content):
+        if remote_id not in self.posts:
+            raise Fault(404, "Invalid post ID.")
+        self.posts[remote_id] = content
+        self.edits.append(remote_id)
+        return True
+
+    def multicall(self, calls):
+        self.multicalls.append(len(calls))
+        return self.server.system_multicall(calls)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_post(i, title=None):
+    return {
+        'title': title or f"Post {i}",
+        'content': f"Body of post {i}",
+        'product_name': f"Product {i}",
+        'category': "electronics",
+        'keywords': ["best product", f"product {i} review"],
+    }
+
+
+@unittest.skipUnless(WP_AVAILABLE, "python-wordpress-xmlrpc is not installed")
+class PublishManyToWordPressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_publisher(self, stub):
+        env = {'WORDPRESS_URL': stub.url, 'WORDPRESS_USERNAME': "admin", 'WORDPRESS_PASSWORD': "secret"}
+        with mock.patch.dict(os.environ, env):
+            publisher = BlogPublisher(
+                ledger=PublishLedger(os.path.join(self.tmp.name, "ledger.db")),
+                search_index=SearchIndex(os.path.join(self.tmp.name, "search.db"))
+            )
+        self.addCleanup(publisher.ledger.close)
+        return publisher
+
+    def test_chunks_posts_into_multicalls(self):
+        with StubWordPress() as stub:
+            publisher = self.make_publisher(stub)
+            results = publisher.publish_many_to_wordpress([make_post(i) for i in range(7)], chunk_size=3)
+
+        self.assertEqual(stub.multicalls, [3, 3, 1])
+        self.assertEqual(len(stub.posts), 7)
+        self.assertEqual([r['action'] for r in results], ['create'] * 7)
+        self.assertTrue(all(r['error'] is None and r['url'].startswith(stub.url) for r in results))
+
+    def test_fault_fails_only_its_own_item(self):
+        posts = [make_post(0), make_post(1, title="Please fail this one"), make_post(2)]
+        with StubWordPress() as stub:
+            publisher = self.make_publisher(stub)
+            results = publisher.publish_many_to_wordpress(posts)
+
+        self.assertEqual(stub.multicalls, [3])
+        self.assertIsNone(results[0]['error'])
+        self.assertIn("Rejected", results[1]['error'])
+        self.assertIsNone(results[1]['url'])
+        self.assertIsNone(results[2]['error'])
+        # Only the successful posts are in the ledger, so the failed one is retried next time.
+        self.assertIsNotNone(publisher.ledger.check(posts[0], 'wordpress')[1])
+        self.assertEqual(publisher.ledger.check(posts[1], 'wordpress'), ('create', None))
+
+    def test_unchanged_posts_skip_and_changed_posts_edit(self):
+        posts = [make_post(i) for i in range(3)]
+        with StubWordPress() as stub:
+            publisher = self.make_publisher(stub)
+            first = publisher.publish_many_to_wordpress(posts)
+            posts[1] = dict(posts[1], content="Rewritten body")
+            second = publisher.publish_many_to_wordpress(posts)
+
+        self.assertEqual([r['action'] for r in second], ['skip', 'update', 'skip'])
+        self.assertEqual(second[1]['url'], first[1]['url'])
+        self.assertEqual(stub.multicalls, [3, 1])
+        self.assertEqual(len(stub.posts), 3)
+        remote_id = first[1]['url'].rsplit("=", 1)[1]
+        self.assertEqual(stub.edits, [remote_id])
+        self.assertIn("Rewritten body", stub.posts[remote_id]['post_content'])
+
+    def test_falls_back_to_single_calls_without_multicall(self):
+        posts = [make_post(0), make_post(1, title="Please fail this one"), make_post(2)]
+        with StubWordPress(multicall=False) as stub:
+            publisher = self.make_publisher(stub)
+            results = publisher.publish_many_to_wordpress(posts)
+
+        self.assertEqual(stub.multicalls, [])
+        self.assertEqual(len(stub.posts), 2)
+        self.assertEqual([r['error'] is None for r in results], [True, False, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import os
+import time
+import tempfile
+import unittest
+
+from dedup import PostDeduplicator
+from records import Product, write_products_csv
+from work_queue import WorkQueue, Worker, run_coordinator
+
+
+class FakeProcessor:
+    """Stands in for PipelineProcessor: records the stages it runs and fails on request"""
+
+    def __init__(self, fail_on=(), delay=0.0):
+        self.fail_on = set(fail_on)
+        self.delay = delay
+        self.runs = []
+        self.post_dedup = PostDeduplicator()
+
+    def run_stage(self, stage, payload):
+        name = payload['product']['name']
+        self.runs.append((name, stage))
+        time.sleep(self.delay)
+        if (name, stage) in self.fail_on:
+            raise RuntimeError(f"{stage} failed for {name}")
+        if stage == "generate":
+            payload['post'] = {
+                'title': f"Post about {name}", 'content': name, 'product_name': name,
+                'category': payload['product']['category'], 'pid': os.getpid()
+            }
+        elif stage == "publish":
+            payload['html'] = f"{name}.html"
+        return payload
+
+
+def slow_processor():
+    # Module level so the coordinator's worker processes can build it
+    return FakeProcessor(delay=0.02)
+
+
+def product(name, category="electronics"):
+    return Product(name=name, price="$10", category=category)
+
+
+class WorkQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = os.path.join(self.tmp.name, "queue.db")
+
+    def queue(self, **kwargs):
+        kwargs.setdefault('visibility_timeout', 0.2)
+        return WorkQueue(self.db_path, **kwargs)
+
+    def test_items_are_claimed_once_in_order(self):
+        queue = self.queue()
+        self.assertEqual(queue.enqueue([product("A"), product("B")]), 2)
+        self.assertEqual(queue.enqueue([product("a"), product("C")]), 1)
+
+        first = queue.claim("w1")
+        second = queue.claim("w2")
+        self.assertEqual([first['payload']['name'], second['payload']['name']], ["A", "B"])
+        self.assertEqual(first['attempts'], 1)
+        self.assertEqual(queue.claim("w3")['payload']['name'], "C")
+        self.assertIsNone(queue.claim("w4"))
+        self.assertEqual(queue.stats(), {'pending': 0, 'leased': 3, 'done': 0, 'failed': 0})
+
+    def test_expired_lease_is_reclaimed_and_old_owner_is_locked_out(self):
+        queue = self.queue()
+        queue.enqueue([product("A")])
+        item = queue.claim("w1")
+        self.assertIsNone(queue.claim("w2"))
+
+        time.sleep(0.3)
+        again = queue.claim("w2")
+        self.assertEqual(again['id'], item['id'])
+        self.assertEqual(again['attempts'], 2)
+        # The first worker's writes no longer land once another worker owns the lease.
+        self.assertFalse(queue.checkpoint(item['id'], "w1", "keywords", {'product': {}}))
+        self.assertFalse(queue.ack(item['id'], "w1", {'post': {}}))
+        self.assertFalse(queue.fail(item['id'], "w1", "late"))
+        self.assertTrue(queue.checkpoint(item['id'], "w2", "keywords", {'product': {}}))
+        self.assertTrue(queue.ack(item['id'], "w2", {'post': {'title': "A"}}))
+        self.assertEqual(queue.results(), [{'post': {'title': "A"}}])
+
+    def test_recovered_lease_resumes_after_last_checkpoint(self):
+        queue = self.queue()
+        queue.enqueue([product("A")])
+        item = queue.claim("crashed")
+        payload = {'product': dict(item['payload'], keywords=["a", "b"])}
+        self.assertTrue(queue.checkpoint(item['id'], "crashed", "keywords", payload))
+
+        time.sleep(0.3)
+        self.assertEqual(queue.recover_expired_leases(), 1)
+        processor = FakeProcessor()
+        self.assertEqual(Worker(queue, processor, worker_id="w2", poll_interval=0.01).run(), 1)
+        self.assertEqual(processor.runs, [("A", "generate"), ("A", "publish")])
+        self.assertEqual(queue.results()[0]['html'], "A.html")
+
+    def test_item_fails_after_max_attempts(self):
+        queue = self.queue(max_attempts=2)
+        queue.enqueue([product("A"), product("B")])
+        processor = FakeProcessor(fail_on={("A", "generate")})
+        Worker(queue, processor, worker_id="w1", poll_interval=0.01).run()
+
+        self.assertEqual(queue.stats(), {'pending': 0, 'leased': 0, 'done': 1, 'failed': 1})
+        self.assertEqual(processor.runs.count(("A", "generate")), 2)
+
+    def test_lease_expiring_too_often_fails_the_item(self):
+        queue = self.queue(max_attempts=2)
+        queue.enqueue([product("A")])
+        queue.claim("w1")
+        time.sleep(0.3)
+        queue.claim("w2")
+        time.sleep(0.3)
+        self.assertIsNone(queue.claim("w3"))
+        queue.recover_expired_leases()
+        self.assertEqual(queue.stats()['failed'], 1)
+
+    def test_local_workers_share_the_queue(self):
+        products_file = os.path.join(self.tmp.name, "products.csv")
+        output_file = os.path.join(self.tmp.name, "blog_posts.json")
+        write_products_csv([product(f"Gadget {i} {'xyz' * i}") for i in range(12)], products_file)
+
+        stats = run_coordinator(products_file, self.db_path, local_workers=3,
+                                output_file=output_file, processor_factory=slow_processor)
+
+        self.assertEqual(stats, {'pending': 0, 'leased': 0, 'done': 12, 'failed': 0})
+        results = self.queue().results()
+        self.assertEqual(len({r['post']['title'] for r in results}), 12)
+        self.assertGreater(len({r['post']['pid'] for r in results}), 1)
+        self.assertTrue(os.path.exists(output_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import multiprocessing
+from contextlib import contextmanager
+from dotenv import load_dotenv
+from dedup import ProductDeduplicator, PostDeduplicator
+from records import BlogPost, read_products_csv, write_posts_json
+
+load_dotenv()
+logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+QUEUE_DB = os.getenv("WORK_QUEUE_DB", "data/work_queue.db")
+VISIBILITY_TIMEOUT = float(os.getenv("WORK_QUEUE_VISIBILITY_TIMEOUT", "300"))
+MAX_ATTEMPTS = int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3"))
+
+# Stages every item passes through, in order. An item records the last stage it
+# completed so a worker that picks up a recovered lease resumes where the crashed
+# worker stopped instead of paying for keyword research or generation again.
+STAGES = ["keywords", "generate", "publish"]
+
+
+class WorkQueue:
+    """Durable SQLite-backed work queue with leases and visibility timeouts"""
+
+    def __init__(self, db_path=QUEUE_DB, visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    item_key TEXT UNIQUE NOT NULL,
+                    payload TEXT NOT NULL,
+                    stage TEXT NOT NULL DEFAULT '',
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_items_status ON items (status, lease_expires)")
+
+    def _connect(self):
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves, which takes
+        # the write lock up front so two workers can never claim the same row.
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        # sqlite3's own context manager only commits or rolls back; the connection
+        # itself has to be closed too, or every call leaves one behind for GC.
+        conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def item_key(product):
+        name = " ".join(str(product.get('name', '')).lower().split())
+        return f"{product.get('category', '')}:{name}"
+
+    def enqueue(self, products):
+        """Add products to the queue, ignoring ones that are already queued"""
+        now = time.time()
+        rows = [(self.item_key(p), json.dumps(p.to_dict() if hasattr(p, 'to_dict') else p), now) for p in products]
+        with self._transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO items (item_key, payload, updated_at) VALUES (?, ?, ?)", rows)
+            added = conn.total_changes - before
+            conn.execute("COMMIT")
+        logging.info(f"Enqueued {added} new items ({len(rows) - added} already queued).")
+        return added
+
+    def claim(self, worker_id):
+        """Lease the next available item, or return None if nothing is claimable"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("""
+                SELECT id, payload, stage, attempts FROM items
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ? AND attempts < ?)
+                ORDER BY id LIMIT 1
+            """, (now, self.max_attempts)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            item_id, payload, stage, attempts = row
+            conn.execute("""
+                UPDATE items SET status = 'leased', lease_owner = ?, lease_expires = ?,
+                                 attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            """, (worker_id, now + self.visibility_timeout, now, item_id))
+            conn.execute("COMMIT")
+            return {'id': item_id, 'payload': json.loads(payload), 'stage': stage, 'attempts': attempts + 1}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_leased(self, item_id, worker_id, sql, params):
+        # Every write made on behalf of a lease is guarded by the owner column, so a
+        # worker whose lease expired and was re-claimed cannot clobber the new owner.
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                sql + " WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                params + (item_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def checkpoint(self, item_id, worker_id, stage, payload):
+        """Record a completed stage and extend the lease"""
+        now = time.time()
+        return self._update_leased(
+            item_id, worker_id,
+            "UPDATE items SET stage = ?, payload = ?, lease_expires = ?, updated_at = ?",
+            (stage, json.dumps(payload), now + self.visibility_timeout, now)
+        )
+
+    def ack(self, item_id, worker_id, result):
+        now = time.time()
+        return self._update_leased(
+            item_id, worker_id,
+            "UPDATE items SET status = 'done', result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?",
+            (json.dumps(result), now)
+        )
+
+    def fail(self, item_id, worker_id, error):
+        """Release a lease after an error; the item is retried until max_attempts"""
+        now = time.time()
+        return self._update_leased(
+            item_id, worker_id,
+            """UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?""",
+            (self.max_attempts, str(error), now)
+        )
+
+    def recover_expired_leases(self):
+        """Return leases held by crashed or stalled workers to the queue"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("""
+                UPDATE items SET status = 'failed', error = 'lease expired too many times',
+                                 lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, now, self.max_attempts))
+            cursor = conn.execute("""
+                UPDATE items SET status = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE status = 'leased' AND lease_expires < ?
+            """, (now, now))
+            conn.execute("COMMIT")
+        if cursor.rowcount:
+            logging.warning(f"Recovered {cursor.rowcount} expired leases.")
+        return cursor.rowcount
+
+    def stats(self):
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        counts.update(dict(rows))
+        return counts
+
+    def results(self):
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT result FROM items WHERE status = 'done' ORDER BY id").fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def generated_posts(self, skip_ids=()):
+        """(id, post) for every item past the generate stage, other than skip_ids"""
+        with self._transaction() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM items WHERE stage IN ('generate', 'publish')") if r[0] not in skip_ids]
+            rows = []
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows.extend(conn.execute(f"SELECT id, payload FROM items WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return [(item_id, json.loads(payload)['post']) for item_id, payload in rows]
+
+
+class PipelineProcessor:
+    """Runs one product through keyword research, generation and publishing"""
+
+    def __init__(self):
+        from keyword_research import KeywordResearchTool
+        from content_generator import BlogContentGenerator
+        from publisher import BlogPublisher
+        from image_pipeline import ImagePipeline
+
+        self.keyword_tool = KeywordResearchTool()
+        self.generator = BlogContentGenerator()
+        self.publisher = BlogPublisher()
+        self.images = ImagePipeline()
+        # Every post generated so far; callers add posts made elsewhere (other workers, earlier runs)
+        self.post_dedup = PostDeduplicator()
+
+    def run_stage(self, stage, payload):
+        if stage == "keywords":
+            keywords = self.keyword_tool.research_keywords_for_product(payload['product'])
+            payload['product']['keywords'] = list(keywords)
+        elif stage == "generate":
+            post = self.generator.generate_blog_post(payload['product'])
+            self.post_dedup.flag(post)
+            # Payloads are checkpointed as JSON, so the post record travels as a dict
+            payload['post'] = post.to_dict()
+        elif stage == "publish":
+            if payload['post'].get('duplicate_of'):
+                payload['html'] = None
+                return payload
+            self.images.prefetch([payload['post'].get('product_image_url')])
+            self.images.attach(payload['post'])
+            payload['html'] = self.publisher.save_as_html(payload['post'])
+            if not payload['html']:
+                raise RuntimeError(f"Publishing failed for: {payload['post']['title']}")
+        return payload
+
+
+class Worker:
+    def __init__(self, queue, processor, worker_id=None, poll_interval=1.0):
+        self.queue = queue
+        self.processor = processor
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.indexed_items = set()
+
+    def sync_posts(self):
+        """Add posts generated by other workers to the processor's duplicate check"""
+        for item_id, post in self.queue.generated_posts(self.indexed_items):
+            self.processor.post_dedup.add(post)
+            self.indexed_items.add(item_id)
+
+    def process(self, item):
+        payload = item['payload']
+        if 'product' not in payload:
+            payload = {'product': payload}
+        done = STAGES.index(item['stage']) + 1 if item['stage'] else 0
+        for stage in STAGES[done:]:
+            if stage == "generate":
+                self.sync_posts()
+            payload = self.processor.run_stage(stage, payload)
+            if stage == "generate":
+                self.indexed_items.add(item['id'])
+            if not self.queue.checkpoint(item['id'], self.worker_id, stage, payload):
+                logging.warning(f"[{self.worker_id}] Lost lease on item {item['id']} during '{stage}'.")
+                return False
+        result = {'post': payload['post'], 'html': payload.get('html')}
+        return self.queue.ack(item['id'], self.worker_id, result)
+
+    def run(self, exit_when_empty=True):
+        logging.info(f"[{self.worker_id}] Worker started.")
+        processed = 0
+        while True:
+            item = self.queue.claim(self.worker_id)
+            if item is None:
+                self.queue.recover_expired_leases()
+                if exit_when_empty and self.queue.stats()['leased'] == 0:
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                if self.process(item):
+                    processed += 1
+            except Exception as e:
+                logging.error(f"[{self.worker_id}] Error processing item {item['id']}: {e}")
+                self.queue.fail(item['id'], self.worker_id, e)
+        logging.info(f"[{self.worker_id}] Worker finished after processing {processed} items.")
+        return processed
+
+
+def run_worker(db_path=QUEUE_DB, worker_id=None, exit_when_empty=True, processor_factory=PipelineProcessor):
+    queue = WorkQueue(db_path)
+    worker = Worker(queue, processor_factory(), worker_id=worker_id)
+    return worker.run(exit_when_empty=exit_when_empty)
+
+
+def run_coordinator(products_file="data/trending_products.csv", db_path=QUEUE_DB,
+                    local_workers=0, output_file="data/blog_posts.json", processor_factory=PipelineProcessor):
+    queue = WorkQueue(db_path)
+    products = read_products_csv(products_file)
+    products, _ = ProductDeduplicator().deduplicate(products)
+    queue.enqueue(products)
+    queue.recover_expired_leases()
+
+    if local_workers:
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(db_path, f"local-{i}", True, processor_factory))
+            for i in range(local_workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+    stats = queue.stats()
+    logging.info(f"Queue status: {stats}")
+    if stats['pending'] == 0 and stats['leased'] == 0:
+        blog_posts = [BlogPost.from_dict(r['post']) for r in queue.results()]
+        write_posts_json(blog_posts, output_file)
+        logging.info(f"Collected {len(blog_posts)} blog posts into {output_file}")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distributed work-queue mode for the blog pipeline")
+    parser.add_argument("role", choices=["coordinator", "worker", "status"])
+    parser.add_argument("--db", default=QUEUE_DB, help="Path to the shared queue database")
+    parser.add_argument("--products", default="data/trending_products.csv")
+    parser.add_argument("--local-workers", type=int, default=0, help="Worker processes the coordinator spawns itself")
+    parser.add_argument("--worker-id", default=None)
+    parser.add_argument("--wait", action="store_true", help="Keep polling for work instead of exiting when the queue is empty")
+    args = parser.parse_args()
+
+    if args.role == "coordinator":
+        run_coordinator(args.products, args.db, args.local_workers)
+    elif args.role == "worker":
+        run_worker(args.db, args.worker_id, exit_when_empty=not args.wait)
+    else:
+        print(json.dumps(WorkQueue(args.db).stats()))